@@ -0,0 +1,343 @@
+"""
+Engine microbenchmarks: pathfinding, field of view and scouting,
+spawning, Scratch list building and state load/save, on seeded worlds
+with synthetic players and creatures.
+
+Run from the repository root:
+    python -m bench.engine [--sizes 200 500] [--players 10 1000 10000]
+                           [--creatures 100 1000] [--only bfs scout ...]
+                           [--min-time 0.3] [--seed 42]
+                           [--baseline bench/baseline.json] [--tolerance 0.25]
+                           [--save-baseline]
+
+Every case reports ops/sec and per-op latency percentiles from a timed
+loop of at least --min-time seconds, plus peak memory of a few extra ops
+run under tracemalloc (kept out of the timed loop, which it slows down).
+
+With --baseline, ops/sec is compared with the stored results and the run
+exits with status 1 if any case is slower by more than --tolerance.
+Baselines are machine specific; regenerate with --save-baseline on the
+machine you compare on.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from src.commands import CommandHandler
+from src.config import Config, get_config, set_config
+from src.fileio import atomic_write_json
+from src.los import get_visible_tiles_in_radius, scout_area
+from src.main import build_scratch_lists
+from src.metrics import percentile
+from src.pathfinding import bfs_shortest_path, find_nearest_valid_tile, path_distance
+from src.persistence import StateStore
+from src.scouted import ScoutedMap
+from src.spawning import spawn_creatures
+from src.world_gen import flatten_grid, generate_world, get_sector_bounds, load_world, new_world_state, save_world
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+INPUTS = 256     # Pre-drawn random inputs per case, cycled through
+MIN_OPS = 5      # Timed ops per case even if they exceed --min-time
+MAX_OPS = 100000
+MEMORY_OPS = 3   # Ops run under tracemalloc for peak memory
+
+class World:
+    """A seeded world plus random walkable positions to draw inputs from."""
+    
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        self.seed = seed
+        self.grid = generate_world(seed, size=size)
+        walkable = self.grid.tiles.walkable
+        cells = self.grid.cells
+        self.open_tiles = [i for i in range(size * size) if walkable[cells[i]]]
+    
+    def rng(self, case: str) -> random.Random:
+        return random.Random(f"{self.seed}:{self.size}:{case}")
+    
+    def random_tile(self, rng: random.Random) -> tuple[int, int]:
+        i = rng.choice(self.open_tiles)
+        return (i % self.size, i // self.size)
+    
+    def nearby_tile(self, rng: random.Random, pos: tuple[int, int], reach: int) -> tuple[int, int]:
+        """A walkable tile within `reach` on each axis (or pos itself)."""
+        size = self.size
+        cells = self.grid.cells
+        walkable = self.grid.tiles.walkable
+        for _ in range(50):
+            x = min(size - 1, max(0, pos[0] + rng.randint(-reach, reach)))
+            y = min(size - 1, max(0, pos[1] + rng.randint(-reach, reach)))
+            if walkable[cells[y * size + x]]:
+                return (x, y)
+        return pos
+
+class Population:
+    """Players and creatures scattered over a World, with state files in a temp dir."""
+    
+    def __init__(self, world: World, players: int, creatures: int, workdir: str):
+        self.world = world
+        self.world_state = new_world_state(world.grid)
+        rng = world.rng(f"population:{players}:{creatures}")
+        self.entities: dict = {"creatures": [], "next_id": 1}
+        self.store = StateStore(
+            self.world_state, {}, self.entities,
+            players_path=os.path.join(workdir, "players.json"),
+            entities_path=os.path.join(workdir, "entities.json"),
+            world_path=os.path.join(workdir, "world.bin")
+        )
+        self.players = self.store.players
+        handler = CommandHandler(self.world_state, world.grid, self.store)
+        for n in range(players):
+            player = handler.create_player(f"player{n}")
+            player["x"], player["y"] = world.random_tile(rng)
+        
+        config = get_config()
+        types = list(config.creature_types)
+        for _ in range(creatures):
+            ctype = rng.choice(types)
+            cdata = config.creature_types[ctype]
+            x, y = world.random_tile(rng)
+            self.store.creatures.add({
+                "type": int(ctype), "type_name": cdata["name"], "x": x, "y": y,
+                "hp": cdata["hp"], "max_hp": cdata["hp"], "tier": cdata["tier"], "chasing": None
+            })
+        
+        # Scout around a tenth of the players so enemy filtering has work to do
+        for player in list(self.players.values())[::10]:
+            scout_area(world.grid, self.world_state, (player["x"], player["y"]), 10, "bench")
+
+def cycled(inputs: list, op: Callable) -> Callable[[int], object]:
+    return lambda i: op(*inputs[i % len(inputs)])
+
+def world_cases(world: World, workdir: str) -> dict[str, Callable[[int], object]]:
+    grid = world.grid
+    size = world.size
+    settings = get_config().settings
+    hub = tuple(settings["hub_center"])
+    max_path = settings["tp_max_path"]
+    cases = {}
+    
+    rng = world.rng("tp")
+    tp_pairs = []
+    for _ in range(INPUTS):
+        start = world.random_tile(rng)
+        tp_pairs.append((start, world.nearby_tile(rng, start, max_path // 2)))
+    cases["bfs_shortest_path.tp"] = cycled(tp_pairs, lambda a, b: bfs_shortest_path(grid, a, b, max_steps=max_path))
+    
+    rng = world.rng("far")
+    far_pairs = [(world.random_tile(rng), world.random_tile(rng)) for _ in range(INPUTS)]
+    cases["bfs_shortest_path.far"] = cycled(far_pairs, lambda a, b: bfs_shortest_path(grid, a, b))
+    cases["path_distance"] = cycled(far_pairs, lambda a, b: path_distance(grid, a, b))
+    
+    rng = world.rng("nearest")
+    sector_size = settings["sector_size"]
+    nearest = []
+    for _ in range(INPUTS):
+        x, y = world.random_tile(rng)
+        min_x, min_y, max_x, max_y = get_sector_bounds(x // sector_size, y // sector_size, sector_size)
+        nearest.append(((x, y), (min_x, min_y, min(max_x, size - 1), min(max_y, size - 1))))
+    cases["find_nearest_valid_tile"] = cycled(
+        nearest, lambda pos, rect: find_nearest_valid_tile(grid, pos, exclude_sector=rect, reachable_from=hub)
+    )
+    
+    rng = world.rng("fov")
+    centers = [(world.random_tile(rng),) for _ in range(INPUTS)]
+    cases["get_visible_tiles_in_radius"] = cycled(centers, lambda c: get_visible_tiles_in_radius(grid, c, 10))
+    
+    scout_state = new_world_state(grid)
+    def scout(i: int):
+        if i % INPUTS == 0:
+            scout_state["scouted"] = ScoutedMap(size)  # Keep most scouts revealing new tiles
+        return scout_area(grid, scout_state, centers[i % INPUTS][0], 10, "bench")
+    cases["scout_area"] = scout
+    
+    cases["flatten_grid"] = lambda i: flatten_grid(grid)
+    
+    world_path = os.path.join(workdir, f"world-{size}.bin")
+    full_state = new_world_state(grid)
+    cases["save_world.full"] = lambda i: save_world(full_state, world_path)
+    
+    rng = world.rng("patch")
+    patches = [[rng.choice(world.open_tiles) for _ in range(10)] for _ in range(INPUTS)]
+    def save_patch(i: int):
+        grid.dirty.update(patches[i % INPUTS])
+        save_world(full_state, world_path, sections_dirty=False)
+    cases["save_world.patch"] = save_patch
+    cases["load_world"] = lambda i: load_world(world_path)
+    return cases
+
+def population_cases(population: Population, workdir: str) -> dict[str, Callable[[int], object]]:
+    world = population.world
+    grid = world.grid
+    store = population.store
+    creatures = store.creatures
+    cases = {}
+    
+    def spawn(i: int):
+        before = population.entities["next_id"]
+        spawn_creatures(creatures, grid, population.world_state, count=3)
+        # Hold the population steady so every op sees the same load
+        for creature_id in range(before, population.entities["next_id"]):
+            creatures.remove(creature_id)
+    cases["spawn_creatures"] = spawn
+    
+    cases["build_scratch_lists"] = lambda i: build_scratch_lists(
+        population.world_state, grid, population.players, population.entities
+    )
+    cases["save_players"] = lambda i: atomic_write_json(store.players_path, population.players)
+    cases["save_entities"] = lambda i: atomic_write_json(store.entities_path, population.entities)
+    
+    def load_json(path: str):
+        with open(path, "r") as f:
+            return json.load(f)
+    atomic_write_json(store.players_path, population.players)
+    atomic_write_json(store.entities_path, population.entities)
+    cases["load_players"] = lambda i: load_json(store.players_path)
+    cases["load_entities"] = lambda i: load_json(store.entities_path)
+    return cases
+
+def run_case(op: Callable[[int], object], min_time: float) -> dict:
+    op(0)  # Warm caches and indexes
+    samples = []
+    clock = time.perf_counter
+    started = clock()
+    i = 1
+    while len(samples) < MAX_OPS and (len(samples) < MIN_OPS or clock() - started < min_time):
+        t0 = clock()
+        op(i)
+        samples.append(clock() - t0)
+        i += 1
+    
+    tracemalloc.start()
+    for j in range(MEMORY_OPS):
+        op(i + j)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    samples.sort()
+    return {
+        "ops": len(samples),
+        "ops_per_sec": len(samples) / sum(samples),
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p90_us": percentile(samples, 90) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+        "peak_kb": peak / 1024
+    }
+
+def case_key(name: str, params: dict) -> str:
+    return name + "".join(f" {k}={v}" for k, v in params.items())
+
+def bench_config(creatures: int) -> Config:
+    """Current config with caps lifted so spawning runs at any fixture population."""
+    raw = dict(get_config().raw)
+    raw["settings"] = {
+        **raw["settings"],
+        "max_creatures": creatures + 3,
+        "max_creatures_per_sector": creatures + 3,
+        "zone_creature_caps": None
+    }
+    return Config(raw)
+
+def load_baseline(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("results", {})
+    except FileNotFoundError:
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engine hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--players", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--creatures", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--only", nargs="+", default=None, help="run cases whose name contains any of these")
+    parser.add_argument("--min-time", type=float, default=0.3, help="seconds of timed ops per case")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed ops/sec drop before failing")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    args = parser.parse_args()
+    
+    def wanted(name: str) -> bool:
+        return args.only is None or any(part in name for part in args.only)
+    
+    baseline = {} if args.save_baseline else load_baseline(args.baseline)
+    results: dict[str, dict] = {}
+    regressions = []
+    
+    print(
+        f"{'case':<58} {'ops':>7} {'ops/s':>10} {'p50 us':>9} {'p90 us':>9} "
+        f"{'p99 us':>9} {'peak KB':>8} {'vs base':>8}"
+    )
+    
+    def report(key: str, result: dict):
+        results[key] = result
+        change = ""
+        base = baseline.get(key)
+        if base:
+            ratio = result["ops_per_sec"] / base["ops_per_sec"]
+            change = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio < 1 - args.tolerance:
+                regressions.append((key, ratio))
+                change += " !"
+        print(
+            f"{key:<58} {result['ops']:>7} {result['ops_per_sec']:>10.1f} {result['p50_us']:>9.1f} "
+            f"{result['p90_us']:>9.1f} {result['p99_us']:>9.1f} {result['peak_kb']:>8.1f} {change:>8}"
+        )
+    
+    original_config = get_config()
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            world = World(size, args.seed)
+            for name, op in world_cases(world, workdir).items():
+                if wanted(name):
+                    report(case_key(name, {"size": size}), run_case(op, args.min_time))
+            
+            for creatures in args.creatures:
+                set_config(bench_config(creatures))
+                try:
+                    for players in args.players:
+                        cases = None
+                        params = {"size": size, "players": players, "creatures": creatures}
+                        population = None
+                        for name in ("spawn_creatures", "build_scratch_lists", "save_players",
+                                     "save_entities", "load_players", "load_entities"):
+                            if not wanted(name):
+                                continue
+                            if cases is None:
+                                population = Population(world, players, creatures, workdir)
+                                cases = population_cases(population, workdir)
+                            report(case_key(name, params), run_case(cases[name], args.min_time))
+                finally:
+                    set_config(original_config)
+    
+    if args.save_baseline:
+        atomic_write_json(args.baseline, {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "seed": args.seed,
+                "min_time": args.min_time
+            },
+            "results": {key: {k: round(v, 3) for k, v in r.items()} for key, r in results.items()}
+        })
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}:")
+        for key, ratio in regressions:
+            print(f"  {key}: {ratio:.2f}x")
+        sys.exit(1)
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+End-to-end load generator: simulated players send commands through
+run_iteration against an in-process fake Scratch project.
+
+Run from the repository root:
+    python -m bench.load [--players 50] [--minutes 10] [--rate 1.0]
+                         [--latency 0.0] [--error-rate 0.0] [--rate-limit 0]
+                         [--interval 0] [--seed 1]
+                         [--replay comments.jsonl] [--record comments.jsonl]
+                         [--metrics metrics.jsonl] [--profile [DIR]]
+
+Each simulated minute, every player posts about --rate commands (a mix
+of !tp, !scout, !mine, !status, ... chosen from their current state) and
+then one bot iteration runs. --replay posts a recorded log instead, one
+JSON object per line: {"minute": 0, "author": "...", "content": "!tp 3 4"};
+--record writes the generated stream in the same format.
+
+The bot runs in a temporary directory with a copy of config/ and fresh
+state, so nothing in the checkout is touched. Iterations run back to
+back unless --interval is given, so throughput is bounded by the bot
+itself. --latency and --error-rate make the fake project slow or
+rate-limited; --rate-limit sets the client-side seconds per request
+(0 = unlimited). The run fails if any posted comment was never processed,
+e.g. because a failed fetch let the watermark skip it.
+
+--profile (or BOT_PROFILE=1, or profiling_enabled in the settings) dumps
+cProfile captures of slow commands and iterations, as the bot does, to
+DIR (default: profile_dir) under the directory the run started in.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from src.fake_scratch import FakeBackend, FakeProject
+from src.main import run_once
+from src.metrics import metrics, percentile
+from src.profiling import profiler
+from src.runtime import create_runtime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATCH_UP_ITERATIONS = 20
+
+def synth_command(rng: random.Random, player: Optional[dict]) -> str:
+    """A plausible next command for a player in this state."""
+    if player is None:
+        return "!start"
+    if player.get("dead"):
+        return rng.choice(["!respawn center", "!respawn station"])
+    if player.get("engaged_with"):
+        return rng.choice(["!attack", "!attack", "!flee"])
+    roll = rng.random()
+    if roll < 0.35:
+        return f"!tp {player['x'] + rng.randint(-6, 6)} {player['y'] + rng.randint(-6, 6)}"
+    if roll < 0.50:
+        return f"!scout {rng.randint(3, 10)}"
+    if roll < 0.65:
+        return "!mine"
+    if roll < 0.80:
+        return "!status"
+    if roll < 0.90:
+        return "!look"
+    return "!attack"
+
+def synth_minute(rng: random.Random, minute: int, players: int, rate: float, state: dict) -> list[dict]:
+    """Commands posted during one minute by `players` simulated players."""
+    posted = []
+    for n in range(players):
+        username = f"sim{n}"
+        count = int(rate) + (rng.random() < rate - int(rate))
+        for _ in range(count):
+            posted.append({"minute": minute, "author": username, "content": synth_command(rng, state.get(username))})
+    rng.shuffle(posted)
+    return posted
+
+def load_replay(path: str) -> dict[int, list[dict]]:
+    by_minute: dict[int, list[dict]] = {}
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                by_minute.setdefault(entry.get("minute", 0), []).append(entry)
+    return by_minute
+
+def summarize(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    return " ".join(f"p{p}={percentile(values, p) * 1000:.1f}ms" for p in (50, 90, 99))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the bot against a fake Scratch project")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--minutes", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1.0, help="commands per player per minute")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake project seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 429")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="client seconds per request (0 = unlimited)")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between iteration starts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--replay", help="JSONL comment log to post instead of synthetic players")
+    parser.add_argument("--record", help="write the posted comments to this JSONL file")
+    parser.add_argument("--metrics", help="also write per-iteration metrics JSON lines here")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="profile slow commands and iterations (default DIR: profile_dir)")
+    args = parser.parse_args()
+    
+    replay = load_replay(os.path.abspath(args.replay)) if args.replay else None
+    record_path = os.path.abspath(args.record) if args.record else None
+    if args.metrics:
+        metrics.open(os.path.abspath(args.metrics))
+    minutes = args.minutes if replay is None else max(replay, default=-1) + 1
+    rng = random.Random(args.seed)
+    
+    workdir = tempfile.mkdtemp(prefix="bot-load-")
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(workdir, "config"))
+    os.makedirs(os.path.join(workdir, "state"))
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        project = FakeProject(latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+        runtime = create_runtime("load-test", {"rate_limit_seconds": args.rate_limit}, backend=FakeBackend(project))
+        metrics.reset()  # Leave world generation out of the numbers
+        marked = set()  # Every comment the bot marked processed, to check none were dropped
+        mark_processed = runtime.mark_processed
+        
+        def mark_and_record(comment):
+            marked.add(comment.id)
+            mark_processed(comment)
+        
+        runtime.mark_processed = mark_and_record
+        # Every comment on the fake project is posted by this run, so scan all
+        # the way back instead of skipping history like a first start does
+        runtime.processed.watermark = {"id": 0, "at": None}
+        profile_settings = dict(runtime.settings)
+        profile_settings["profile_dir"] = os.path.join(previous_dir, args.profile or profile_settings.get("profile_dir", "profiles"))
+        if args.profile is not None:
+            profile_settings["profiling_enabled"] = True
+        profiler.configure(profile_settings)
+        
+        posted_total = 0
+        iteration_times = []
+        started = time.perf_counter()
+        record = open(record_path, "w") if record_path else None
+        try:
+            for minute in range(minutes):
+                if replay is None:
+                    posted = synth_minute(rng, minute, args.players, args.rate, runtime.players)
+                else:
+                    posted = replay.get(minute, [])
+                for entry in posted:
+                    project.add_comment(entry["author"], entry["content"])
+                    if record:
+                        record.write(json.dumps(entry) + "\n")
+                posted_total += len(posted)
+                
+                iteration_started = time.perf_counter()
+                run_once(runtime)
+                iteration_times.append(time.perf_counter() - iteration_started)
+                if args.interval:
+                    time.sleep(max(0.0, args.interval - iteration_times[-1]))
+            # Catch up on comments failed polls left behind
+            for _ in range(CATCH_UP_ITERATIONS):
+                if len(marked) >= len(project.comments_newest_first):
+                    break
+                iteration_started = time.perf_counter()
+                run_once(runtime)
+                iteration_times.append(time.perf_counter() - iteration_started)
+        finally:
+            if record:
+                record.close()
+        busy = sum(iteration_times)
+        runtime.replies.drain(timeout=60)
+        wall = time.perf_counter() - started
+        runtime.close(timeout=5)
+        lost = sum(1 for comment in project.comments_newest_first if comment.id not in marked)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    handled = metrics.counters.get("commands_run", 0)
+    print()
+    metrics.close()
+    print()
+    print(f"Simulated minutes:   {minutes} ({'replay' if replay is not None else f'{args.players} players'})")
+    print(f"Commands posted:     {posted_total}, handled: {handled:.0f}, never processed: {lost}")
+    print(f"Wall time:           {wall:.1f}s (iterations {busy:.1f}s)")
+    if busy > 0:
+        print(f"Throughput:          {handled / busy * 60:.0f} commands per minute of iteration time")
+    print(f"Iteration time:      {summarize(iteration_times)}")
+    print(f"Reply latency:       {summarize([r['latency'] for r in project.replies])} ({len(project.replies)} replies)")
+    print(f"Replies failed:      {metrics.counters.get('replies_failed', 0):.0f}, retried: {metrics.counters.get('replies_retried', 0):.0f}")
+    per_upload = project.upload_bytes / project.uploads if project.uploads else 0
+    print(f"Sync:                {project.uploads} uploads, {project.upload_bytes / 1024:.0f} KB total, {per_upload / 1024:.0f} KB each")
+    print(f"Fake project:        {project.requests} requests, {project.errors} injected errors")
+    if profiler.enabled:
+        print(f"Profiles:            {len(profiler.dumps)} saved in {profiler.directory}")
+    if lost:
+        raise SystemExit(f"{lost} posted comment(s) were never processed")
+
+if __name__ == "__main__":
+    main()
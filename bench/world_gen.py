@@ -0,0 +1,50 @@
+"""
+World generation benchmark: time and peak memory per world size.
+
+Run from the repository root:
+    python -m bench.world_gen [--sizes 200 500 1000] [--seed 42] [--repeat 3]
+
+Time is the best of --repeat runs. Peak memory is measured in a separate
+run under tracemalloc (which slows generation down), so it does not skew
+the timing.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from src.world_gen import generate_world
+
+def bench_size(size: int, seed: int, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        generate_world(seed, size=size)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    
+    tracemalloc.start()
+    generate_world(seed, size=size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {"size": size, "seconds": best, "peak_mb": peak / (1024 * 1024)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark world generation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 500, 1000])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    print(f"{'size':>6} {'tiles':>10} {'seconds':>9} {'us/tile':>8} {'peak MB':>8}")
+    for size in args.sizes:
+        result = bench_size(size, args.seed, args.repeat)
+        tiles = size * size
+        print(
+            f"{size:>6} {tiles:>10} {result['seconds']:>9.3f} "
+            f"{result['seconds'] / tiles * 1e6:>8.2f} {result['peak_mb']:>8.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,22 @@ import json
 import re
 import math
 import random
+import time
 from typing import Optional, Callable
 from datetime import datetime
 
-from src.pathfinding import bfs_shortest_path, path_distance, is_walkable, load_tile_config
-from src.los import scout_area, get_visible_tiles_in_radius
-
-def load_settings() -> dict:
-    with open("config/settings.json", "r") as f:
-        return json.load(f)
+from src.config import get_config
+from src.fileio import atomic_write_json
+from src.grid import Grid
+from src.persistence import StateStore
+from src.pathfinding import bfs_shortest_path, path_distance
+from src.regions import get_region_index
+from src.los import plan_scout, commit_scout
+from src.metrics import metrics
+from src.profiling import profiler
+from src.sectors import pending_warning
+from src.spawning import record_death
+from src.timers import cooldown_remaining, start_cooldown, sync_player
 
 def load_players() -> dict:
     try:
@@ -24,8 +31,7 @@ def load_players() -> dict:
         return {}
 
 def save_players(players: dict):
-    with open("state/players.json", "w") as f:
-        json.dump(players, f, indent=2)
+    atomic_write_json("state/players.json", players)
 
 def load_entities() -> dict:
     try:
@@ -35,24 +41,43 @@ def load_entities() -> dict:
         return {"creatures": [], "next_id": 1}
 
 def save_entities(entities: dict):
-    with open("state/entities.json", "w") as f:
-        json.dump(entities, f, indent=2)
+    atomic_write_json("state/entities.json", entities)
 
 class CommandHandler:
-    def __init__(self, world_state: dict, grid: list[list[int]]):
+    def __init__(self, world_state: dict, grid: Grid, store: Optional[StateStore] = None):
         self.world_state = world_state
         self.grid = grid
-        self.settings = load_settings()
-        self.tiles_config = load_tile_config()
-        self.players = load_players()
-        self.entities = load_entities()
+        if store is None:
+            store = StateStore(world_state, load_players(), load_entities())
+        # Commands mark what they mutate; the caller flushes once per iteration.
+        self.store = store
+        self.players = store.players
+        self.entities = store.entities
+        self.creatures = store.creatures
         self.responses = []  # List of (comment_id, response_text)
     
+    @property
+    def settings(self) -> dict:
+        return get_config().settings
+    
     def handle_command(self, username: str, comment_id: str, text: str) -> Optional[str]:
         """
         Parse and handle a command from a user comment.
         Returns response text, or None if not a command.
         """
+        with profiler.section("command", lambda: self._profile_context(username, comment_id, text)):
+            return self._handle_command(username, comment_id, text)
+    
+    def _profile_context(self, username: str, comment_id: str, text: str) -> dict:
+        player = self.players.get(username)
+        return {
+            "player": username,
+            "comment_id": comment_id,
+            "text": text,
+            "position": [player["x"], player["y"]] if player else None
+        }
+    
+    def _handle_command(self, username: str, comment_id: str, text: str) -> Optional[str]:
         text = text.strip().lower()
         
         if not text.startswith("!"):
@@ -77,13 +102,18 @@ class CommandHandler:
         
         handler = handlers.get(cmd)
         if handler:
-            return handler(username, args)
+            metrics.count("commands_run")
+            with metrics.timer(f"command.{cmd[1:]}"):
+                return handler(username, args)
         else:
             return f"Unknown command: {cmd}. Use !help for available commands."
     
     def get_player(self, username: str) -> Optional[dict]:
-        """Get player data, or None if not registered."""
-        return self.players.get(username)
+        """Get player data caught up on energy and cooldowns, or None if not registered."""
+        player = self.players.get(username)
+        if player is not None and sync_player(player):
+            self.store.mark_player(username)
+        return player
     
     def create_player(self, username: str) -> dict:
         """Create a new player at hub center."""
@@ -95,6 +125,7 @@ class CommandHandler:
             "max_hp": 100,
             "energy": 100,
             "max_energy": 100,
+            "energy_at": time.time(),  # energy regenerates lazily from here
             "xp": 0,
             "level": 1,
             "coins": 0,
@@ -104,12 +135,12 @@ class CommandHandler:
                 "tool": None,
                 "armor": None
             },
-            "cooldowns": {},  # tier harvest cooldowns
+            "cooldowns": {},  # tier harvest cooldown expiry times (unix seconds)
             "engaged_with": None,  # creature id if in combat
             "dead": False
         }
         self.players[username] = player
-        save_players(self.players)
+        self.store.mark_player(username)
         return player
     
     def cmd_start(self, username: str, args: list) -> str:
@@ -152,6 +183,11 @@ class CommandHandler:
         if player.get("dead"):
             status += " | DEAD (use !respawn)"
         
+        regen_in = pending_warning(self.world_state, player["x"], player["y"])
+        if regen_in is not None:
+            hours, minutes = divmod(int(regen_in // 60), 60)
+            status += f" | SECTOR COLLAPSES IN {hours}h{minutes:02d}m"
+        
         return status
     
     def cmd_tp(self, username: str, args: list) -> str:
@@ -179,12 +215,12 @@ class CommandHandler:
         end = (tx, ty)
         
         # Check if target is walkable
-        if not is_walkable(self.grid[ty][tx], self.tiles_config):
+        if not self.grid.is_walkable(tx, ty):
             return f"Cannot teleport to ({tx}, {ty}) - not walkable."
         
         # Find path
         max_path = self.settings["tp_max_path"]
-        path = bfs_shortest_path(self.grid, start, end, self.tiles_config, max_path)
+        path = bfs_shortest_path(self.grid, start, end, max_path)
         
         if path is None:
             return f"No valid path to ({tx}, {ty}) within {max_path} steps."
@@ -195,12 +231,13 @@ class CommandHandler:
         if player.get("engaged_with"):
             creature = self.get_creature_by_id(player["engaged_with"])
             if creature:
-                old_dist = path_distance(self.grid, start, (creature["x"], creature["y"]), self.tiles_config)
-                new_dist = path_distance(self.grid, end, (creature["x"], creature["y"]), self.tiles_config)
+                # The new spot is no further from the creature if a search
+                # bounded by the current distance still reaches it
+                cpos = (creature["x"], creature["y"])
+                old_dist = path_distance(self.grid, start, cpos)
                 
-                if new_dist is not None and old_dist is not None:
-                    if new_dist > old_dist:
-                        return f"In combat! Can only move closer to enemy. Use !flee to escape."
+                if old_dist is not None and bfs_shortest_path(self.grid, end, cpos, old_dist) is None:
+                    return f"In combat! Can only move closer to enemy. Use !flee to escape."
         
         # Check energy cost
         energy_cost = path_len * self.settings["tp_energy_per_step"]
@@ -217,7 +254,7 @@ class CommandHandler:
         if player.get("engaged_with"):
             combat_msg = self.process_creature_chase(username, player)
         
-        save_players(self.players)
+        self.store.mark_player(username)
         
         result = f"Teleported to ({tx}, {ty}). Energy: {player['energy']}/{player['max_energy']}."
         if combat_msg:
@@ -232,24 +269,21 @@ class CommandHandler:
             return "Use !start first."
         
         x, y = player["x"], player["y"]
-        tile = self.grid[y][x]
         
         # Get tile info
         tile_name = "floor"
-        if str(tile) in self.tiles_config["ore"]:
-            ore_info = self.tiles_config["ore"][str(tile)]
+        ore_info = self.grid.ore_info(x, y)
+        if ore_info:
             tile_name = ore_info["name"]
-        elif tile in self.tiles_config["hazard"]:
+        elif self.grid.is_hazard(x, y):
             tile_name = "hazard (magma)"
         
         # Check for nearby creatures (if scouted)
         nearby_creatures = []
-        for creature in self.entities.get("creatures", []):
-            dist = abs(creature["x"] - x) + abs(creature["y"] - y)
-            if dist <= 5:
-                key = f"{creature['x']},{creature['y']}"
-                if key in self.world_state.get("scouted", {}):
-                    nearby_creatures.append(f"{creature['type_name']} at ({creature['x']},{creature['y']})")
+        scouted = self.world_state["scouted"]
+        for creature in self.creatures.within_manhattan(x, y, 5):
+            if scouted.is_scouted(creature["x"], creature["y"]):
+                nearby_creatures.append(f"{creature['type_name']} at ({creature['x']},{creature['y']})")
         
         result = f"You are at ({x}, {y}) on {tile_name}."
         if nearby_creatures:
@@ -277,21 +311,23 @@ class CommandHandler:
             radius = 1
         
         pos = (player["x"], player["y"])
-        newly_scouted, energy_cost = scout_area(
-            self.grid, self.world_state, pos, radius, username
-        )
+        _, newly_scouted, energy_cost = plan_scout(self.grid, self.world_state, pos, radius)
         
         if player["energy"] < energy_cost:
             return f"Not enough energy. Need {energy_cost}, have {player['energy']}."
         
         player["energy"] -= energy_cost
+        if newly_scouted:
+            commit_scout(self.grid, self.world_state, newly_scouted, username)
+            self.store.mark_world("scouted")
         
         # Check for creatures and alert chance
         alert_msg = ""
         creatures_found = []
-        for creature in self.entities.get("creatures", []):
-            cpos = (creature["x"], creature["y"])
-            if cpos in [(t[0], t[1]) for t in newly_scouted]:
+        new_tiles = set(newly_scouted)
+        size = self.grid.size
+        for creature in self.creatures.within_radius(pos[0], pos[1], radius):
+            if creature["y"] * size + creature["x"] in new_tiles:
                 creatures_found.append(creature)
         
         if creatures_found and not player.get("engaged_with"):
@@ -309,12 +345,15 @@ class CommandHandler:
         
         # Count ores found
         ores_found = 0
-        for (tx, ty) in newly_scouted:
-            if str(self.grid[ty][tx]) in self.tiles_config["ore"]:
+        ore = self.grid.tiles.ore
+        cells = self.grid.cells
+        for i in newly_scouted:
+            if ore[cells[i]]:
                 ores_found += 1
         
-        save_players(self.players)
-        save_entities(self.entities)
+        self.store.mark_player(username)
+        if alert_msg:
+            self.store.mark_entities()
         
         return (
             f"Scouted {len(newly_scouted)} tiles (radius {radius}). "
@@ -332,22 +371,19 @@ class CommandHandler:
             return "You are dead. Use !respawn."
         
         x, y = player["x"], player["y"]
-        tile = self.grid[y][x]
         
-        tile_str = str(tile)
-        if tile_str not in self.tiles_config["ore"]:
+        ore_info = self.grid.ore_info(x, y)
+        if ore_info is None:
             return "No ore here to mine."
         
-        ore_info = self.tiles_config["ore"][tile_str]
         ore_name = ore_info["yield"]
         ore_tier = ore_info["tier"]
         
         # Check harvest cooldown
         cooldown_key = f"tier_{ore_tier}"
-        if cooldown_key in player.get("cooldowns", {}):
-            remaining = player["cooldowns"][cooldown_key]
-            if remaining > 0:
-                return f"Tier {ore_tier} harvest on cooldown. {remaining} minutes remaining."
+        remaining = cooldown_remaining(player, cooldown_key)
+        if remaining > 0:
+            return f"Tier {ore_tier} harvest on cooldown. {remaining} minutes remaining."
         
         # Mine the ore
         if ore_name not in player["inventory"]:
@@ -355,20 +391,11 @@ class CommandHandler:
         player["inventory"][ore_name] += 1
         
         # Replace ore with floor
-        self.grid[y][x] = self.tiles_config["primary_floor"]
+        self.grid.set(x, y, self.grid.tiles.primary_floor)
         
         # Apply cooldown based on player level vs tier
-        with open("config/tiers.json", "r") as f:
-            tiers_config = json.load(f)
-        
-        base_cooldown = tiers_config["harvest_cooldowns_minutes"].get(str(ore_tier), 30)
-        level_diff = max(0, player["level"] - ore_tier)
-        multiplier = tiers_config["cooldown_multiplier_per_level_diff"] ** level_diff
-        final_cooldown = int(base_cooldown * multiplier)
-        
-        if "cooldowns" not in player:
-            player["cooldowns"] = {}
-        player["cooldowns"][cooldown_key] = final_cooldown
+        final_cooldown = get_config().harvest_cooldown(ore_tier, player["level"])
+        start_cooldown(player, cooldown_key, final_cooldown)
         
         # XP gain
         player["xp"] += ore_tier * 5
@@ -377,17 +404,16 @@ class CommandHandler:
         # Check for creature alert from mining noise
         alert_msg = ""
         if not player.get("engaged_with"):
-            for creature in self.entities.get("creatures", []):
-                dist = abs(creature["x"] - x) + abs(creature["y"] - y)
-                if dist <= 5:
-                    if random.random() < 0.3:
-                        player["engaged_with"] = creature["id"]
-                        creature["chasing"] = username
-                        alert_msg = f" Mining noise alerted a {creature['type_name']}!"
-                        break
-        
-        save_players(self.players)
-        save_entities(self.entities)
+            for creature in self.creatures.within_manhattan(x, y, 5):
+                if random.random() < 0.3:
+                    player["engaged_with"] = creature["id"]
+                    creature["chasing"] = username
+                    alert_msg = f" Mining noise alerted a {creature['type_name']}!"
+                    break
+        
+        self.store.mark_player(username)
+        if alert_msg:
+            self.store.mark_entities()
         
         return f"Mined 1 {ore_name}! Inventory: {player['inventory'].get(ore_name, 0)}.{alert_msg}"
     
@@ -407,25 +433,18 @@ class CommandHandler:
         else:
             # Look for creature within 3 tiles
             x, y = player["x"], player["y"]
-            for c in self.entities.get("creatures", []):
-                dist = abs(c["x"] - x) + abs(c["y"] - y)
-                if dist <= 3:
-                    creature = c
-                    player["engaged_with"] = c["id"]
-                    c["chasing"] = username
-                    break
+            nearby = self.creatures.within_manhattan(x, y, 3)
+            if nearby:
+                creature = nearby[0]
+                player["engaged_with"] = creature["id"]
+                creature["chasing"] = username
         
         if not creature:
             return "No creature to attack. Scout to find enemies or get within 3 tiles."
         
         # Calculate damage
-        base_damage = 5
-        weapon = player["equipment"].get("weapon")
-        if weapon:
-            with open("config/items.json", "r") as f:
-                items = json.load(f)
-            if weapon in items.get("weapons", {}):
-                base_damage = items["weapons"][weapon]["damage"]
+        config = get_config()
+        base_damage = config.weapon_damage_for(player["equipment"].get("weapon"))
         
         creature["hp"] -= base_damage
         
@@ -436,11 +455,7 @@ class CommandHandler:
             result += f"{creature['type_name']} defeated! "
             
             # Drop loot
-            with open("config/creatures.json", "r") as f:
-                creatures_config = json.load(f)
-            
-            ctype = str(creature["type"])
-            drops = creatures_config["types"].get(ctype, {}).get("drops", {})
+            drops = config.creature_type(creature["type"]).get("drops", {})
             for item, qty in drops.items():
                 if item not in player["inventory"]:
                     player["inventory"][item] = 0
@@ -453,16 +468,11 @@ class CommandHandler:
             
             # Remove creature
             player["engaged_with"] = None
-            self.entities["creatures"] = [
-                c for c in self.entities["creatures"] if c["id"] != creature["id"]
-            ]
+            self.creatures.remove(creature["id"])
+            record_death(self.creatures, self.grid, creature, store=self.store)
         else:
             # Creature counterattacks
-            with open("config/creatures.json", "r") as f:
-                creatures_config = json.load(f)
-            
-            ctype = str(creature["type"])
-            c_damage = creatures_config["types"].get(ctype, {}).get("damage", 5)
+            c_damage = config.creature_type(creature["type"]).get("damage", 5)
             player["hp"] -= c_damage
             result += f"{creature['type_name']} hits you for {c_damage}! HP: {player['hp']}/{player['max_hp']}"
             
@@ -471,8 +481,8 @@ class CommandHandler:
                 player["engaged_with"] = None
                 result += " YOU DIED! Use !respawn center or !respawn station."
         
-        save_players(self.players)
-        save_entities(self.entities)
+        self.store.mark_player(username)
+        self.store.mark_entities()
         
         return result
     
@@ -488,7 +498,7 @@ class CommandHandler:
         creature = self.get_creature_by_id(player["engaged_with"])
         if not creature:
             player["engaged_with"] = None
-            save_players(self.players)
+            self.store.mark_player(username)
             return "The creature is gone. You're safe."
         
         # Find position 10 steps away from creature
@@ -513,7 +523,9 @@ class CommandHandler:
         target_x = max(0, min(size - 1, target_x))
         target_y = max(0, min(size - 1, target_y))
         
-        # Find nearest valid tile to target
+        # Find nearest valid tile to target that the player can actually reach
+        regions = get_region_index(self.grid)
+        player_region = regions.region_at(px, py)
         best_pos = None
         for r in range(20):
             for ddx in range(-r, r + 1):
@@ -522,7 +534,9 @@ class CommandHandler:
                         continue
                     nx, ny = target_x + ddx, target_y + ddy
                     if 0 <= nx < size and 0 <= ny < size:
-                        if is_walkable(self.grid[ny][nx], self.tiles_config):
+                        if self.grid.is_walkable(nx, ny):
+                            if player_region != -1 and regions.region_at(nx, ny) != player_region:
+                                continue
                             best_pos = (nx, ny)
                             break
                 if best_pos:
@@ -535,21 +549,21 @@ class CommandHandler:
         
         player["x"], player["y"] = best_pos
         
-        # Check if disengaged
-        new_dist = path_distance(
-            self.grid, best_pos, (cx, cy), self.tiles_config
-        )
-        
+        # Check if disengaged: a search bounded by the disengage distance
+        # finds no path once the creature is far enough away
         disengage = self.settings["disengage_distance"]
-        if new_dist and new_dist >= disengage:
+        path = bfs_shortest_path(self.grid, best_pos, (cx, cy), disengage - 1)
+        new_dist = len(path) - 1 if path is not None else None
+        
+        if path is None and regions.same_region(best_pos, (cx, cy)):
             player["engaged_with"] = None
             creature["chasing"] = None
             result = f"You fled and escaped! Now at safety."
         else:
             result = f"You fled but {creature['type_name']} is still chasing! Distance: {new_dist}"
         
-        save_players(self.players)
-        save_entities(self.entities)
+        self.store.mark_player(username)
+        self.store.mark_entities()
         
         return result
     
@@ -576,7 +590,7 @@ class CommandHandler:
             player["dead"] = False
             player["engaged_with"] = None
             
-            save_players(self.players)
+            self.store.mark_player(username)
             return f"Respawned at hub ({hub[0]}, {hub[1]}). All items intact."
         
         elif choice == "station":
@@ -597,7 +611,7 @@ class CommandHandler:
             player["dead"] = False
             player["engaged_with"] = None
             
-            save_players(self.players)
+            self.store.mark_player(username)
             return f"Respawned at hub (no stations built yet). Lost half your items."
         
         else:
@@ -605,10 +619,7 @@ class CommandHandler:
     
     def get_creature_by_id(self, creature_id: int) -> Optional[dict]:
         """Find a creature by ID."""
-        for c in self.entities.get("creatures", []):
-            if c["id"] == creature_id:
-                return c
-        return None
+        return self.creatures.get(creature_id)
     
     def process_creature_chase(self, username: str, player: dict) -> str:
         """Process creature movement when player takes an action."""
@@ -621,11 +632,7 @@ class CommandHandler:
             return ""
         
         # Creature moves toward player
-        with open("config/creatures.json", "r") as f:
-            creatures_config = json.load(f)
-        
-        ctype = str(creature["type"])
-        speed = creatures_config["types"].get(ctype, {}).get("speed", 1)
+        speed = get_config().creature_type(creature["type"]).get("speed", 1)
         
         # Simple movement: move `speed` steps toward player
         px, py = player["x"], player["y"]
@@ -641,10 +648,11 @@ class CommandHandler:
             else:
                 new_x, new_y = cx, cy + dy
             
-            if is_walkable(self.grid[new_y][new_x], self.tiles_config):
+            if self.grid.is_walkable(new_x, new_y):
                 cx, cy = new_x, new_y
         
-        creature["x"], creature["y"] = cx, cy
+        self.creatures.move(creature, cx, cy)
+        self.store.mark_entities()
         
         # Check if caught player
         if cx == px and cy == py:
@@ -663,6 +671,5 @@ class CommandHandler:
             player["max_energy"] += 10
     
     def save_all(self):
-        """Save all state."""
-        save_players(self.players)
-        save_entities(self.entities)
+        """Save all pending state changes."""
+        self.store.flush()
@@ -0,0 +1,154 @@
+"""
+Central config registry.
+
+All config/*.json files are parsed once into a Config snapshot together
+with lookup tables derived from them, so commands and ticks never touch
+the disk for config. get_config() re-stats the files at most once per
+CHECK_INTERVAL seconds and builds a fresh snapshot only when a file's
+mtime changed. Snapshots are treated as read-only; callers that need to
+change settings at runtime should edit the file instead.
+
+Grids keep the TileClasses they were built with, so tile class changes
+apply to newly loaded or generated worlds.
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+from src.grid import TileClasses
+from src.metrics import metrics
+
+CONFIG_DIR = "config"
+CONFIG_FILES = ("settings", "tiles", "tiers", "items", "creatures")
+CHECK_INTERVAL = 1.0  # Seconds between mtime checks
+
+DEFAULT_WEAPON_DAMAGE = 5
+DEFAULT_HARVEST_COOLDOWN = 30
+
+class Config:
+    def __init__(self, raw: dict[str, dict]):
+        self.raw = raw
+        self.settings: dict = raw["settings"]
+        self.tiers: dict = raw["tiers"]
+        self.items: dict = raw["items"]
+        self.tiles = TileClasses(raw["tiles"])
+        
+        # Creature types keyed by the string ids used in creatures.json
+        self.creature_types: dict[str, dict] = raw["creatures"]["types"]
+        tier_list = sorted(self.tiers["tiers"], key=lambda t: t["tier"])
+        self.max_tier = tier_list[-1]["tier"] if tier_list else 1
+        # creature_types_by_tier[t]: types that may spawn in a tier-t area (tier <= t)
+        self.creature_types_by_tier: dict[int, tuple[str, ...]] = {
+            tier: tuple(ctype for ctype, cdata in self.creature_types.items() if cdata["tier"] <= tier)
+            for tier in range(1, self.max_tier + 1)
+        }
+        # (max_dist, tier) pairs for tier_for_distance
+        self._tier_bands = [(t["max_dist"], t["tier"]) for t in tier_list]
+        
+        # Ore placement bands: tier t spawns (t - 1) * 25 <= dist <= t * 40
+        # from the hub. Table index is 2 * floor(dist), +1 if dist is not a
+        # whole number, so the integer band edges are honoured exactly.
+        ore_bands = [
+            (int(ore_id), (ore["tier"] - 1) * 25, ore["tier"] * 40)
+            for ore_id, ore in raw["tiles"]["ore"].items()
+        ]
+        max_band = max((hi for _, _, hi in ore_bands), default=0)
+        self._ore_ids_by_band: list[tuple[int, ...]] = []
+        for slot in range(2 * max_band + 2):
+            lo_dist = slot // 2
+            hi_dist = lo_dist + (slot & 1)
+            self._ore_ids_by_band.append(tuple(
+                ore_id for ore_id, lo, hi in ore_bands if lo <= lo_dist and hi_dist <= hi
+            ))
+        
+        self.weapon_damage: dict[str, int] = {
+            name: weapon["damage"] for name, weapon in self.items.get("weapons", {}).items()
+        }
+        self.harvest_cooldowns: dict[int, int] = {
+            int(tier): minutes for tier, minutes in self.tiers["harvest_cooldowns_minutes"].items()
+        }
+        self.cooldown_multiplier = self.tiers["cooldown_multiplier_per_level_diff"]
+    
+    def creature_type(self, ctype) -> dict:
+        """Config entry for a creature type id (int or str), or {} if unknown."""
+        return self.creature_types.get(str(ctype), {})
+    
+    def tier_for_distance(self, dist: float) -> int:
+        """Difficulty tier of a spot `dist` tiles from the hub."""
+        for max_dist, tier in self._tier_bands:
+            if dist <= max_dist:
+                return tier
+        return self.max_tier
+    
+    def ore_ids_at_distance(self, dist: float) -> tuple[int, ...]:
+        """Ore tile ids that may be placed `dist` tiles from the hub."""
+        whole = int(dist)
+        slot = 2 * whole + (dist != whole)
+        if slot >= len(self._ore_ids_by_band):
+            return ()
+        return self._ore_ids_by_band[slot]
+    
+    def weapon_damage_for(self, weapon: Optional[str]) -> int:
+        return self.weapon_damage.get(weapon, DEFAULT_WEAPON_DAMAGE)
+    
+    def harvest_cooldown(self, ore_tier: int, player_level: int) -> int:
+        """Harvest cooldown in minutes, longer when out-levelling the ore."""
+        base = self.harvest_cooldowns.get(ore_tier, DEFAULT_HARVEST_COOLDOWN)
+        level_diff = max(0, player_level - ore_tier)
+        return int(base * self.cooldown_multiplier ** level_diff)
+
+_config: Optional[Config] = None
+_mtimes: dict[str, float] = {}
+_checked_at = 0.0
+
+def _config_path(name: str) -> str:
+    return os.path.join(CONFIG_DIR, f"{name}.json")
+
+def _current_mtimes() -> dict[str, float]:
+    return {name: os.stat(_config_path(name)).st_mtime for name in CONFIG_FILES}
+
+def load_config() -> Config:
+    """Parse every config file into a new snapshot (no caching)."""
+    raw = {}
+    for name in CONFIG_FILES:
+        with open(_config_path(name), "r") as f:
+            raw[name] = json.load(f)
+    return Config(raw)
+
+def set_config(config: Config):
+    """
+    Install a snapshot directly, e.g. one with overridden settings for a
+    benchmark or simulation. It stays until a config file changes on disk.
+    """
+    global _config, _mtimes, _checked_at
+    _mtimes = _current_mtimes()
+    _checked_at = time.monotonic()
+    _config = config
+
+def get_config() -> Config:
+    """The current config snapshot, reloaded if any file changed on disk."""
+    global _config, _mtimes, _checked_at
+    now = time.monotonic()
+    if _config is not None and now - _checked_at < CHECK_INTERVAL:
+        return _config
+    _checked_at = now
+    
+    try:
+        mtimes = _current_mtimes()
+        if _config is not None and mtimes == _mtimes:
+            return _config
+        _mtimes = mtimes
+        with metrics.timer("load.config"):
+            config = load_config()
+    except (OSError, ValueError, KeyError) as e:
+        if _config is None:
+            raise
+        print(f"Config reload failed, keeping previous config: {e}")
+        return _config
+    
+    if _config is not None:
+        print("Config files changed, reloaded")
+    _config = config
+    return _config
@@ -0,0 +1,151 @@
+"""
+Creature index: id -> creature map plus a uniform-grid spatial hash.
+
+Creatures stay in entities["creatures"] (the list saved to
+state/entities.json); this store indexes that list so lookups by id,
+removals and proximity queries don't scan every creature. All adds,
+moves and removals must go through the store to keep the index in sync.
+"""
+
+from typing import Callable, Hashable, Iterator, Optional
+
+BUCKET_SIZE = 8  # Spatial hash cell size in tiles
+
+class CreatureStore:
+    def __init__(self, entities: dict, bucket_size: int = BUCKET_SIZE):
+        self.entities = entities
+        self.bucket_size = bucket_size
+        self.list: list[dict] = entities.setdefault("creatures", [])
+        entities.setdefault("next_id", 1)
+        self.by_id: dict[int, dict] = {}
+        self._position: dict[int, int] = {}  # id -> index in self.list
+        self._buckets: dict[tuple[int, int], dict[int, dict]] = {}
+        # name -> (key function of (x, y), population per key)
+        self._counters: dict[str, tuple[Callable[[int, int], Hashable], dict]] = {}
+        for i, creature in enumerate(self.list):
+            self._index(creature, i)
+    
+    def __len__(self) -> int:
+        return len(self.list)
+    
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.list)
+    
+    def _bucket(self, x: int, y: int) -> tuple[int, int]:
+        return (x // self.bucket_size, y // self.bucket_size)
+    
+    def _index(self, creature: dict, position: int):
+        self.by_id[creature["id"]] = creature
+        self._position[creature["id"]] = position
+        self._buckets.setdefault(self._bucket(creature["x"], creature["y"]), {})[creature["id"]] = creature
+    
+    def _unbucket(self, creature: dict):
+        key = self._bucket(creature["x"], creature["y"])
+        bucket = self._buckets[key]
+        del bucket[creature["id"]]
+        if not bucket:
+            del self._buckets[key]
+    
+    def _count(self, creature: dict, delta: int):
+        for key_fn, counts in self._counters.values():
+            key = key_fn(creature["x"], creature["y"])
+            counts[key] = counts.get(key, 0) + delta
+    
+    def add_counter(self, name: str, key_fn: Callable[[int, int], Hashable]):
+        """
+        Keep a live population count per key_fn(x, y) (e.g. per sector),
+        updated on every add, move and remove. Replaces any counter with
+        the same name.
+        """
+        counts: dict = {}
+        for creature in self.list:
+            key = key_fn(creature["x"], creature["y"])
+            counts[key] = counts.get(key, 0) + 1
+        self._counters[name] = (key_fn, counts)
+    
+    def has_counter(self, name: str) -> bool:
+        return name in self._counters
+    
+    def population(self, name: str, key) -> int:
+        """Creatures currently counted under `key` by the named counter."""
+        return self._counters[name][1].get(key, 0)
+    
+    def get(self, creature_id) -> Optional[dict]:
+        return self.by_id.get(creature_id)
+    
+    def add(self, creature: dict) -> dict:
+        """Add a creature, assigning it the next id. Returns the stored creature."""
+        creature = {"id": self.entities["next_id"], **creature}
+        self.entities["next_id"] += 1
+        self.list.append(creature)
+        self._index(creature, len(self.list) - 1)
+        self._count(creature, 1)
+        return creature
+    
+    def remove(self, creature_id) -> Optional[dict]:
+        """Remove a creature by id in O(1). Returns it, or None if unknown."""
+        creature = self.by_id.pop(creature_id, None)
+        if creature is None:
+            return None
+        self._unbucket(creature)
+        self._count(creature, -1)
+        
+        # Swap the last creature into the freed slot
+        position = self._position.pop(creature_id)
+        last = self.list.pop()
+        if last is not creature:
+            self.list[position] = last
+            self._position[last["id"]] = position
+        return creature
+    
+    def move(self, creature: dict, x: int, y: int):
+        """Move a creature, updating its spatial hash bucket and counters."""
+        self._count(creature, -1)
+        if self._bucket(x, y) != self._bucket(creature["x"], creature["y"]):
+            self._unbucket(creature)
+            creature["x"], creature["y"] = x, y
+            self._buckets.setdefault(self._bucket(x, y), {})[creature["id"]] = creature
+        else:
+            creature["x"], creature["y"] = x, y
+        self._count(creature, 1)
+    
+    def in_rect(self, min_x: int, min_y: int, max_x: int, max_y: int) -> list[dict]:
+        """Creatures with min_x <= x <= max_x and min_y <= y <= max_y, in id order."""
+        bx0, by0 = self._bucket(min_x, min_y)
+        bx1, by1 = self._bucket(max_x, max_y)
+        buckets = self._buckets
+        found = []
+        if (bx1 - bx0 + 1) * (by1 - by0 + 1) > len(buckets):
+            # Query covers more cells than are occupied: walk the occupied ones
+            keys = [k for k in buckets if bx0 <= k[0] <= bx1 and by0 <= k[1] <= by1]
+        else:
+            keys = [(bx, by) for by in range(by0, by1 + 1) for bx in range(bx0, bx1 + 1)]
+        for key in keys:
+            bucket = buckets.get(key)
+            if not bucket:
+                continue
+            for creature in bucket.values():
+                if min_x <= creature["x"] <= max_x and min_y <= creature["y"] <= max_y:
+                    found.append(creature)
+        found.sort(key=lambda c: c["id"])
+        return found
+    
+    def within_manhattan(self, x: int, y: int, distance: int) -> list[dict]:
+        """Creatures within `distance` steps (Manhattan), in id order."""
+        return [
+            c for c in self.in_rect(x - distance, y - distance, x + distance, y + distance)
+            if abs(c["x"] - x) + abs(c["y"] - y) <= distance
+        ]
+    
+    def within_radius(self, x: int, y: int, radius: float) -> list[dict]:
+        """Creatures within euclidean `radius`, in id order."""
+        r = int(radius)
+        radius_sq = radius * radius
+        return [
+            c for c in self.in_rect(x - r, y - r, x + r, y + r)
+            if (c["x"] - x) ** 2 + (c["y"] - y) ** 2 <= radius_sq
+        ]
+    
+    def at(self, x: int, y: int) -> list[dict]:
+        """Creatures standing on a tile."""
+        return self.in_rect(x, y, x, y)
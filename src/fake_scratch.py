@@ -0,0 +1,145 @@
+"""
+In-process stand-in for a Scratch project, for offline runs and load tests.
+
+FakeProject holds comments (newest first, like the site), the replies
+posted to them and the project JSON whose stage lists the bot syncs. It
+can add a fixed latency per request and fail a share of requests with a
+"429 Too Many Requests" error, so rate-limit handling and retries get
+exercised. Pass FakeBackend(project) to ScratchAPI / create_runtime in
+place of the scratchattach backend.
+"""
+
+import copy
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from src.fileio import encode_json
+
+# Lists the bot publishes (see main.build_scratch_lists)
+DEFAULT_LISTS = (
+    "GRID", "USERS:USERNAME", "USERS:X", "USERS:Y", "ENEMIES:X", "ENEMIES:Y", "ENEMIES:TYPE"
+)
+
+class FakeScratchError(Exception):
+    pass
+
+class FakeComment:
+    def __init__(self, project: "FakeProject", comment_id: int, author: str, content: str, parent_id=None):
+        self.project = project
+        self.id = comment_id
+        self.author_name = author
+        self.content = content
+        self.parent_id = parent_id
+        self.created_at = time.time()
+        self.datetime_created = datetime.fromtimestamp(self.created_at, timezone.utc).isoformat()
+    
+    def reply(self, content: str):
+        self.project._request()
+        self.project.record_reply(self, content)
+
+class FakeProject:
+    def __init__(
+        self,
+        list_names=DEFAULT_LISTS,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()  # Replies arrive from the reply sender thread
+        self._ids = itertools.count(1)
+        
+        self.comments_newest_first: list[FakeComment] = []
+        self.by_id: dict[int, FakeComment] = {}
+        self.replies: list[dict] = []  # {"comment_id", "content", "latency"}
+        self.json = {
+            "targets": [{
+                "isStage": True,
+                "lists": {f"list{i}": [name, []] for i, name in enumerate(list_names)}
+            }]
+        }
+        
+        self.requests = 0
+        self.errors = 0
+        self.uploads = 0
+        self.upload_bytes = 0
+        self.downloads = 0
+    
+    def _request(self):
+        """Count a request, apply latency, and maybe fail it as rate limited."""
+        with self.lock:
+            self.requests += 1
+            fail = self.error_rate > 0 and self.rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise FakeScratchError("429 Too Many Requests")
+    
+    def add_comment(self, author: str, content: str, parent_id=None) -> FakeComment:
+        """Post a comment as `author` (what a player does)."""
+        with self.lock:
+            comment = FakeComment(self, next(self._ids), author, content, parent_id)
+            self.comments_newest_first.insert(0, comment)
+            self.by_id[comment.id] = comment
+        return comment
+    
+    def record_reply(self, comment: FakeComment, content: str):
+        with self.lock:
+            self.replies.append({
+                "comment_id": comment.id,
+                "content": content,
+                "latency": time.time() - comment.created_at
+            })
+    
+    def comments(self, limit: int = 40, offset: int = 0) -> list[FakeComment]:
+        self._request()
+        with self.lock:
+            return self.comments_newest_first[offset:offset + limit]
+    
+    def comment_by_id(self, comment_id) -> Optional[FakeComment]:
+        self._request()
+        return self.by_id.get(int(comment_id))
+    
+    def raw_json(self) -> dict:
+        self._request()
+        self.downloads += 1
+        return copy.deepcopy(self.json)
+    
+    def set_json(self, project_json: dict):
+        self._request()
+        data = encode_json(project_json)
+        self.uploads += 1
+        self.upload_bytes += len(data)
+        self.json = copy.deepcopy(project_json)
+    
+    def stage_list(self, name: str) -> Optional[list]:
+        """Current contents of a stage list, as the Scratch project would see it."""
+        for list_name, values in self.json["targets"][0]["lists"].values():
+            if list_name == name:
+                return values
+        return None
+
+class FakeSession:
+    def __init__(self, project: FakeProject):
+        self.project = project
+    
+    def connect_project(self, project_id) -> FakeProject:
+        return self.project
+
+class FakeBackend:
+    """ScratchAPI backend serving one FakeProject; any session id logs in."""
+    
+    def __init__(self, project: Optional[FakeProject] = None):
+        self.project = project if project is not None else FakeProject()
+    
+    def connect(self, session_id: str, project_id: int):
+        session = FakeSession(self.project)
+        return session, session.connect_project(project_id)
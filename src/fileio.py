@@ -0,0 +1,34 @@
+"""
+Atomic file writes: data goes to a temp file in the same directory, is
+fsynced, and then renamed over the target, so a crash can never leave a
+half-written state file behind.
+"""
+
+import json
+import os
+import tempfile
+
+def encode_json(data) -> bytes:
+    """Compact JSON encoding used for all state files."""
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+def atomic_write_bytes(filepath: str, data: bytes):
+    """Replace filepath with data atomically."""
+    directory = os.path.dirname(filepath) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(filepath))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def atomic_write_json(filepath: str, data):
+    """Replace filepath with the compact JSON encoding of data atomically."""
+    atomic_write_bytes(filepath, encode_json(data))
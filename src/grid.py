@@ -0,0 +1,143 @@
+"""
+Compact world grid: a flat bytearray of costume numbers plus O(1)
+tile-class lookup tables built once from config/tiles.json.
+"""
+
+import json
+from typing import Optional
+
+TILE_TABLE_SIZE = 256
+
+class TileClasses:
+    """
+    256-entry lookup tables indexed by costume number.
+    Each table holds 1 if the tile belongs to that class, else 0.
+    """
+    
+    def __init__(self, tiles_config: dict):
+        self.config = tiles_config
+        self.walkable = bytearray(TILE_TABLE_SIZE)
+        self.wall = bytearray(TILE_TABLE_SIZE)
+        self.ore = bytearray(TILE_TABLE_SIZE)
+        self.hazard = bytearray(TILE_TABLE_SIZE)
+        self.ore_info: list[Optional[dict]] = [None] * TILE_TABLE_SIZE
+        
+        for tile in tiles_config["floor"]:
+            self.walkable[tile] = 1
+        for ore_id, ore_data in tiles_config["ore"].items():
+            tile = int(ore_id)
+            self.walkable[tile] = 1
+            self.ore[tile] = 1
+            self.ore_info[tile] = ore_data
+        for tile in tiles_config.get("hazard", []):
+            self.walkable[tile] = 1  # Walkable but harmful
+            self.hazard[tile] = 1
+        for tile in tiles_config["wall"]:
+            self.wall[tile] = 1
+        
+        self.primary_floor = tiles_config["primary_floor"]
+        self.primary_wall = tiles_config["primary_wall"]
+
+_tile_classes_cache: dict[str, TileClasses] = {}
+
+def load_tile_classes(filepath: Optional[str] = None) -> TileClasses:
+    """
+    Tile lookup tables. By default these come from the config registry;
+    an explicit path is loaded once per process.
+    """
+    if filepath is None:
+        from src.config import get_config  # src.config imports this module
+        return get_config().tiles
+    tiles = _tile_classes_cache.get(filepath)
+    if tiles is None:
+        with open(filepath, "r") as f:
+            tiles = TileClasses(json.load(f))
+        _tile_classes_cache[filepath] = tiles
+    return tiles
+
+class Grid:
+    """
+    Square world grid stored row-major in a flat bytearray.
+    Index of (x, y) is y * size + x.
+    """
+    
+    def __init__(
+        self,
+        size: int,
+        fill: int = 0,
+        cells: Optional[bytearray] = None,
+        tiles: Optional[TileClasses] = None
+    ):
+        self.size = size
+        if cells is None:
+            cells = bytearray([fill]) * (size * size)
+        elif not isinstance(cells, bytearray):
+            cells = bytearray(cells)
+        if len(cells) != size * size:
+            raise ValueError(f"Grid needs {size * size} cells, got {len(cells)}")
+        self.cells = cells
+        self.tiles = tiles if tiles is not None else load_tile_classes()
+        # Tile indexes changed since the grid was last saved. all_dirty means
+        # the grid has never been saved and must be written out in full.
+        self.dirty: set[int] = set()
+        self.all_dirty = True
+        # Derived indexes (e.g. connected regions) built over this grid, and
+        # callbacks(index, now_walkable) that keep them in sync on set().
+        self.indexes: dict = {}
+        self.walkability_listeners: list = []
+    
+    @classmethod
+    def from_rows(cls, rows: list[list[int]], tiles: Optional[TileClasses] = None) -> "Grid":
+        """Build a grid from the legacy grid[y][x] nested-list layout."""
+        size = len(rows)
+        cells = bytearray()
+        for row in rows:
+            cells.extend(row)
+        return cls(size, cells=cells, tiles=tiles)
+    
+    def to_rows(self) -> list[list[int]]:
+        """Return the grid as nested lists (grid[y][x])."""
+        size = self.size
+        cells = self.cells
+        return [list(cells[y * size:(y + 1) * size]) for y in range(size)]
+    
+    def index(self, x: int, y: int) -> int:
+        return y * self.size + x
+    
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.size and 0 <= y < self.size
+    
+    def get(self, x: int, y: int) -> int:
+        return self.cells[y * self.size + x]
+    
+    def set(self, x: int, y: int, tile: int):
+        i = y * self.size + x
+        old = self.cells[i]
+        if old != tile:
+            self.cells[i] = tile
+            self.dirty.add(i)
+            walkable = self.tiles.walkable
+            if walkable[old] != walkable[tile]:
+                for listener in self.walkability_listeners:
+                    listener(i, walkable[tile] == 1)
+    
+    def mark_clean(self):
+        """Record that the grid matches what is on disk."""
+        self.dirty.clear()
+        self.all_dirty = False
+    
+    def is_walkable(self, x: int, y: int) -> bool:
+        return self.tiles.walkable[self.cells[y * self.size + x]] == 1
+    
+    def is_wall(self, x: int, y: int) -> bool:
+        return self.tiles.wall[self.cells[y * self.size + x]] == 1
+    
+    def is_ore(self, x: int, y: int) -> bool:
+        return self.tiles.ore[self.cells[y * self.size + x]] == 1
+    
+    def is_hazard(self, x: int, y: int) -> bool:
+        return self.tiles.hazard[self.cells[y * self.size + x]] == 1
+    
+    def ore_info(self, x: int, y: int) -> Optional[dict]:
+        """Ore config entry for the tile at (x, y), or None if not ore."""
+        return self.tiles.ore_info[self.cells[y * self.size + x]]
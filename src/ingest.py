@@ -0,0 +1,109 @@
+"""
+Incremental comment ingestion. Comments come back newest first, so we
+page backwards from offset 0 until we reach one that was already
+processed (or is at/below the watermark), and return only the new ones.
+
+A backlog deeper than one call's max_pages is scanned over several calls
+through a ScanCursor. Nothing is returned until the scan reaches processed
+comments, so the watermark never moves past a comment not yet fetched.
+"""
+
+from typing import Optional
+
+def comment_id_key(comment_id) -> int:
+    """Numeric ordering key for a comment ID (Scratch IDs increase over time)."""
+    try:
+        return int(comment_id)
+    except (TypeError, ValueError):
+        return -1
+
+class ScanCursor:
+    """Where an unfinished backwards scan resumes, and what it found so far."""
+    
+    def __init__(self):
+        self.offset = 0
+        self.found: dict = {}  # comment id -> comment, newest first
+    
+    @property
+    def active(self) -> bool:
+        return self.offset > 0
+    
+    def reset(self):
+        self.offset = 0
+        self.found = {}
+
+def fetch_new_comments(
+    api,
+    processed,
+    page_size: int = 40,
+    probe_size: int = 5,
+    max_pages: int = 10,
+    cursor: Optional[ScanCursor] = None
+) -> list:
+    """
+    Fetch every comment newer than what we have processed.
+    `processed` is a ProcessedStore.
+    
+    The first request only asks for `probe_size` comments, so a quiet
+    minute costs one small request. If all of those are new we keep paging
+    with `page_size` until we hit a seen comment, run out of comments, or
+    reach `max_pages`.
+    
+    With a `cursor`, a scan that reaches max_pages returns nothing and
+    leaves the cursor active; the next call carries on from there (new
+    comments posted meanwhile only push the rest further back, and are
+    picked up by the following scan). Without one, or before anything was
+    ever processed (no watermark to scan back to), older comments beyond
+    max_pages are skipped.
+    
+    A failed request also returns nothing, never a partial batch: handling
+    the newer half would move the watermark past the unfetched rest. With
+    a cursor the scan resumes where it failed.
+    
+    Returns new comments sorted oldest first.
+    """
+    if processed.watermark is None:
+        cursor = None  # Fresh store: don't replay the project's whole history
+    if cursor is not None and cursor.active:
+        found = cursor.found
+        offset = cursor.offset
+        limit = page_size
+    else:
+        found = {}
+        offset = 0
+        limit = probe_size
+    for _ in range(max_pages + 1):
+        page = api.get_comments(limit=limit, offset=offset)
+        if page is None:
+            if cursor is not None:
+                cursor.offset = offset
+                cursor.found = found
+            return []
+        if not page:
+            break
+        
+        reached_seen = False
+        for comment in page:
+            if processed.is_seen(comment):
+                reached_seen = True
+            else:
+                found.setdefault(comment.id, comment)
+        
+        if reached_seen or len(page) < limit:
+            break
+        
+        offset += limit
+        limit = page_size
+    else:
+        if cursor is None:
+            print(f"Warning: more than {offset} new comments; older ones were not fetched")
+        else:
+            cursor.offset = offset
+            cursor.found = found
+            print(f"More than {len(found)} new comments; continuing the scan from offset {offset}")
+            return []
+    
+    if cursor is not None:
+        cursor.reset()
+    new_comments = sorted(found.values(), key=lambda c: (str(c.datetime_created or ""), comment_id_key(c.id)))
+    return new_comments
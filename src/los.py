@@ -1,19 +1,15 @@
 """
 Line of Sight calculations for scouting.
-Uses Bresenham's line algorithm to check wall blocking.
+Scouting checks Bresenham lines from the scout to every tile in range,
+using ray templates precomputed per radius.
 """
 
-import json
 import math
-from typing import Optional
+import time
+from array import array
 
-def load_tile_config() -> dict:
-    with open("config/tiles.json", "r") as f:
-        return json.load(f)
-
-def is_wall(tile: int, tiles_config: dict) -> bool:
-    """Check if a tile blocks line of sight."""
-    return tile in tiles_config["wall"]
+from src.grid import Grid
+from src.metrics import metrics
 
 def bresenham_line(x0: int, y0: int, x1: int, y1: int) -> list[tuple[int, int]]:
     """
@@ -42,67 +38,133 @@ def bresenham_line(x0: int, y0: int, x1: int, y1: int) -> list[tuple[int, int]]:
     return points
 
 def has_line_of_sight(
-    grid: list[list[int]],
+    grid: Grid,
     start: tuple[int, int],
-    end: tuple[int, int],
-    tiles_config: Optional[dict] = None
+    end: tuple[int, int]
 ) -> bool:
     """
     Check if there's clear line of sight from start to end.
     Returns False if any wall tile blocks the path.
     """
-    if tiles_config is None:
-        tiles_config = load_tile_config()
-    
-    size = len(grid)
+    size = grid.size
+    cells = grid.cells
+    wall = grid.tiles.wall
     line = bresenham_line(start[0], start[1], end[0], end[1])
     
     # Check all tiles along the line (except start and end)
     for x, y in line[1:-1]:
         if not (0 <= x < size and 0 <= y < size):
             return False
-        if is_wall(grid[y][x], tiles_config):
+        if wall[cells[y * size + x]]:
             return False
     
     return True
 
-def get_visible_tiles_in_radius(
-    grid: list[list[int]],
-    center: tuple[int, int],
-    radius: int,
-    tiles_config: Optional[dict] = None
-) -> list[tuple[int, int]]:
+_ray_templates: dict[int, list] = {}
+
+def _rays(radius: int) -> list[tuple[int, int, tuple[int, ...]]]:
+    """
+    Bresenham rays from the center to every offset in a circle of
+    `radius`, built once per radius: (dx, dy, cells strictly between),
+    the cells as indexes into the (2r+1)^2 box around the center. Offsets
+    are in row-major order.
     """
-    Get all tiles within radius that have line of sight from center.
-    Used for !scout command.
+    rays = _ray_templates.get(radius)
+    if rays is None:
+        w = 2 * radius + 1
+        rays = []
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                if dx * dx + dy * dy > radius * radius:
+                    continue
+                line = bresenham_line(0, 0, dx, dy)
+                rays.append((dx, dy, tuple((ly + radius) * w + lx + radius for lx, ly in line[1:-1])))
+        _ray_templates[radius] = rays
+    return rays
+
+def compute_fov(
+    grid: Grid,
+    center: tuple[int, int],
+    radius: int
+) -> array:
     """
-    if tiles_config is None:
-        tiles_config = load_tile_config()
+    Every tile within `radius` (euclidean) with line of sight from
+    center, by the same rule as has_line_of_sight: no wall strictly
+    between them on the Bresenham line. Rays come from precomputed
+    templates and walls are read once into a box around the center, so a
+    scout does no per-tile line building or grid lookups.
     
-    size = len(grid)
+    Returns flat indices (y * size + x) in row-major order.
+    """
+    size = grid.size
+    cells = grid.cells
+    wall = grid.tiles.wall
     cx, cy = center
-    visible = []
+    w = 2 * radius + 1
     
-    for dy in range(-radius, radius + 1):
-        for dx in range(-radius, radius + 1):
-            # Check if within circle
-            if dx*dx + dy*dy > radius*radius:
-                continue
-            
-            tx, ty = cx + dx, cy + dy
-            
-            # Bounds check
-            if not (0 <= tx < size and 0 <= ty < size):
-                continue
-            
-            # Check line of sight
-            if has_line_of_sight(grid, center, (tx, ty), tiles_config):
-                visible.append((tx, ty))
+    # opaque[k]: the box cell k is a wall or off the map
+    opaque = bytearray(b"\x01") * (w * w)
+    for ly in range(w):
+        y = cy - radius + ly
+        if not 0 <= y < size:
+            continue
+        row = y * size
+        for lx in range(max(0, radius - cx), min(w, size - cx + radius)):
+            opaque[ly * w + lx] = wall[cells[row + cx - radius + lx]]
     
+    visible = array("i")
+    checked = 0
+    for dx, dy, between in _rays(radius):
+        x, y = cx + dx, cy + dy
+        if not (0 <= x < size and 0 <= y < size):
+            continue
+        checked += 1
+        for k in between:
+            if opaque[k]:
+                break
+        else:
+            visible.append(y * size + x)
+    metrics.count("los_cells_checked", checked)
     return visible
 
+def get_visible_tiles_in_radius(
+    grid: Grid,
+    center: tuple[int, int],
+    radius: int
+) -> list[tuple[int, int]]:
+    """
+    Get all tiles within radius that are visible from center.
+    """
+    size = grid.size
+    return [(i % size, i // size) for i in compute_fov(grid, center, radius)]
+
+def scout_cost(tiles_checked: int) -> int:
+    """Energy cost of a scout: ceil(tiles_checked / 5)."""
+    return math.ceil(tiles_checked / 5)
+
+def plan_scout(
+    grid: Grid,
+    world_state: dict,
+    player_pos: tuple[int, int],
+    radius: int
+) -> tuple[array, array, int]:
+    """
+    Work out what a scout would reveal without changing anything, so the
+    caller can check the energy cost first.
+    
+    Returns:
+        (visible flat indices, not-yet-scouted flat indices, energy cost)
+    """
+    visible = compute_fov(grid, player_pos, radius)
+    unscouted = world_state["scouted"].unscouted(visible)
+    return visible, unscouted, scout_cost(len(visible))
+
+def commit_scout(grid: Grid, world_state: dict, tiles: array, player_name: str) -> array:
+    """Record flat tile indices as scouted by player_name. Returns the newly scouted ones."""
+    return world_state["scouted"].add(tiles, player_name, int(time.time()))
+
 def scout_area(
-    grid: list[list[int]],
+    grid: Grid,
     world_state: dict,
     player_pos: tuple[int, int],
     radius: int,
@@ -114,23 +176,7 @@ def scout_area(
     Returns:
         (list of newly scouted tiles, energy cost)
     """
-    visible = get_visible_tiles_in_radius(grid, player_pos, radius)
-    
-    # Calculate energy cost: ceil(tiles_checked / 5)
-    energy_cost = math.ceil(len(visible) / 5)
-    
-    # Update scouted tiles in world state
-    if "scouted" not in world_state:
-        world_state["scouted"] = {}
-    
-    newly_scouted = []
-    for (tx, ty) in visible:
-        key = f"{tx},{ty}"
-        if key not in world_state["scouted"]:
-            world_state["scouted"][key] = {
-                "by": player_name,
-                "at": None  # Will be set to timestamp
-            }
-            newly_scouted.append((tx, ty))
-    
-    return newly_scouted, energy_cost
+    _, unscouted, energy_cost = plan_scout(grid, world_state, player_pos, radius)
+    unscouted = commit_scout(grid, world_state, unscouted, player_name)
+    size = grid.size
+    return [(i % size, i // size) for i in unscouted], energy_cost
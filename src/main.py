@@ -1,35 +1,44 @@
 """
-Main entry point for the bot. Runs one iteration (called every minute by GitHub Actions).
+Main entry point for the bot.
+
+Default mode runs for 60 one-minute world ticks (launched hourly by GitHub
+Actions) and exits shortly before the hour is up. --daemon runs until
+SIGTERM/SIGINT. Ticks, comment polls, list syncs and checkpoints run on
+their own deadlines (see src/scheduler.py). In both modes the Scratch
+login and all game state stay in memory.
 """
 
 import os
-import json
+import argparse
+import signal
 import time
 from datetime import datetime
+from typing import Callable, Optional
 
-from src.scratch_api import ScratchAPI
-from src.world_gen import generate_world, flatten_grid, load_world, save_world
-from src.commands import CommandHandler, load_players, save_players, load_entities, save_entities
+from src.grid import Grid
+from src.world_gen import flatten_grid
+from src.ingest import fetch_new_comments
+from src.metrics import metrics
+from src.profiling import profiler
+from src.runtime import Runtime, create_runtime, load_settings
+from src.scheduler import PhaseBudget, Scheduler
 from src.tick import process_tick
 
-def load_processed() -> set:
-    """Load set of processed comment IDs."""
-    try:
-        with open("state/processed.json", "r") as f:
-            return set(json.load(f))
-    except FileNotFoundError:
-        return set()
-
-def save_processed(processed: set):
-    """Save processed comment IDs."""
-    with open("state/processed.json", "w") as f:
-        json.dump(list(processed), f)
-
-def build_scratch_lists(world_state: dict, grid: list[list[int]], players: dict, entities: dict) -> dict:
-    """Build all lists to sync to Scratch."""
+def build_scratch_lists(
+    world_state: dict,
+    grid: Grid,
+    players: dict,
+    entities: dict,
+    publish_scouted: bool = False
+) -> dict:
+    """
+    Build all lists to sync to Scratch. With publish_scouted, GRID layer 1
+    carries the scouted map (1 = scouted, "" = fog).
+    """
+    scouted = world_state["scouted"]
     
     # GRID: flatten world (120,000 elements)
-    flat_grid = flatten_grid(grid)
+    flat_grid = flatten_grid(grid, scouted.layer if publish_scouted else None)
     
     # Users lists (parallel)
     usernames = []
@@ -46,8 +55,7 @@ def build_scratch_lists(world_state: dict, grid: list[list[int]], players: dict,
     enemy_type = []
     for creature in entities.get("creatures", []):
         # Only include if scouted
-        key = f"{creature['x']},{creature['y']}"
-        if key in world_state.get("scouted", {}):
+        if scouted.is_scouted(creature["x"], creature["y"]):
             enemy_x.append(creature["x"])
             enemy_y.append(creature["y"])
             enemy_type.append(creature["type"])
@@ -62,70 +70,49 @@ def build_scratch_lists(world_state: dict, grid: list[list[int]], players: dict,
         "ENEMIES:TYPE": enemy_type,
     }
 
-def run_iteration():
-    """Run one bot iteration."""
-    # Load settings
-    with open("config/settings.json", "r") as f:
-        settings = json.load(f)
-    
-    project_id = settings["project_id"]
-    session_id = os.environ.get("SCRATCH_SESSION_ID")
-    
-    if not session_id:
-        print("ERROR: SCRATCH_SESSION_ID not set")
-        return
-    
-    # Initialize API
-    api = ScratchAPI(session_id, project_id, rate_limit=settings["rate_limit_seconds"])
-    
-    # Load or generate world
-    world_data = load_world()
-    if world_data is None:
-        print("Generating new world...")
-        grid = generate_world()
-        world_data = {
-            "grid": grid,
-            "scouted": {},
-            "sectors": {},
-            "structures": [],
-            "calamities": [],
-            "bounties": []
-        }
-        save_world(grid)
-    else:
-        grid = world_data["grid"]
-    
-    # Load player/entity state
-    players = load_players()
-    entities = load_entities()
-    
-    # Process world tick
-    process_tick(world_data, grid, players, entities)
-    
-    # Load processed comments
-    processed = load_processed()
-    
-    # Fetch and process new comments
-    comments = api.get_comments(limit=40)
-    
-    # Sort by datetime (oldest first)
-    comments.sort(key=lambda c: c.datetime_created if c.datetime_created else "")
+def run_tick(runtime: Runtime):
+    """Advance the world by one tick."""
+    with metrics.timer("process_tick"):
+        process_tick(runtime.world_data, runtime.grid, runtime.players, runtime.entities, runtime.store)
+
+def poll_commands(runtime: Runtime, budget: Optional[PhaseBudget] = None) -> tuple[int, bool]:
+    """
+    Fetch new comments and handle the commands among them, oldest first.
+    If `budget` runs out the rest of the batch is left unprocessed; it is
+    newer than everything processed, so the next poll fetches it again.
+    A backlog too deep for one poll is fetched over several polls before
+    any of it is handled.
+    Returns (new comments handled, whether the batch was cut short).
+    """
+    api = runtime.api
+    handler = runtime.handler
+    runtime.ensure_logged_in()
     
-    handler = CommandHandler(world_data, grid)
-    handler.players = players
-    handler.entities = entities
+    # Fetch only comments newer than the watermark (oldest first)
+    comments = fetch_new_comments(
+        api,
+        runtime.processed,
+        page_size=runtime.settings.get("comment_page_size", 40),
+        max_pages=runtime.settings.get("comment_max_pages", 10),
+        cursor=runtime.comment_scan
+    )
+    if runtime.comment_scan.active:
+        return 0, True  # Backlog scan not finished: poll again right away
+    metrics.count("comments_seen", len(comments))
     
-    for comment in comments:
-        if comment.id in processed:
-            continue
+    for handled, comment in enumerate(comments):
+        # Always handle at least one comment so a slow fetch can't stall the queue
+        if handled and budget is not None and budget.exhausted():
+            print(f"Poll budget used up, deferring {len(comments) - handled} comment(s)")
+            return handled, True
         
         if not comment.content:
-            processed.add(comment.id)
+            runtime.mark_processed(comment)
             continue
         
         # Only process top-level comments
         if comment.parent_id is not None:
-            processed.add(comment.id)
+            runtime.mark_processed(comment)
             continue
         
         username = comment.author_name
@@ -136,48 +123,141 @@ def run_iteration():
             response = handler.handle_command(username, comment.id, text)
             
             if response:
-                success = api.reply_to_comment(comment.id, response)
-                if not success:
-                    print(f"Failed to reply to {comment.id}")
+                # Posted by the background sender; processing continues
+                runtime.replies.submit(comment, response)
         
-        processed.add(comment.id)
-    
-    # Save all state
-    players = handler.players
-    entities = handler.entities
-    
-    save_players(players)
-    save_entities(entities)
-    save_world(grid)
-    save_processed(processed)
+        runtime.mark_processed(comment)
     
-    # Build and sync Scratch lists
-    lists_to_sync = build_scratch_lists(world_data, grid, players, entities)
+    return len(comments), False
+
+def sync_lists(runtime: Runtime) -> bool:
+    """Build and push the Scratch lists. Returns True on success."""
+    runtime.ensure_logged_in()
+    with metrics.timer("build_scratch_lists"):
+        lists_to_sync = build_scratch_lists(
+            runtime.world_data, runtime.grid, runtime.players, runtime.entities,
+            publish_scouted=runtime.settings.get("publish_scouted_layer", False)
+        )
     
     print(f"Syncing to Scratch: {len(lists_to_sync)} lists")
-    success = api.update_lists(lists_to_sync)
+    with metrics.timer("update_lists"):
+        success = runtime.api.update_lists(lists_to_sync)
     
     if success:
         print("Scratch sync complete")
     else:
         print("Scratch sync failed")
+    return success
+
+def run_checkpoint(runtime: Runtime):
+    written = runtime.checkpoint()
+    print(f"Checkpoint: saved {len(written)} state file(s)")
+
+def run_iteration(runtime: Runtime):
+    """Run every phase once, back to back, against the resident runtime state."""
+    runtime.ensure_logged_in()
+    run_tick(runtime)
+    poll_commands(runtime)
+    
+    # Save state on the checkpoint schedule
+    if runtime.checkpoint_due():
+        run_checkpoint(runtime)
+    
+    sync_lists(runtime)
+
+def run_once(runtime: Runtime):
+    """Run one iteration, logging (not raising) any error, then flush its metrics."""
+    with metrics.timer("iteration"), profiler.section("iteration"):
+        run_guarded("iteration", run_iteration, runtime)
+    metrics.flush()
+
+def run_guarded(name: str, phase: Callable, *args):
+    """Run a phase, logging (not raising) any error. Returns its result or None."""
+    try:
+        return phase(*args)
+    except Exception as e:
+        print(f"Error in {name}: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def run_due_phases(runtime: Runtime, scheduler: Scheduler):
+    """Run whichever phases are due now, in tick, poll, sync, checkpoint order."""
+    now = time.time()
+    if scheduler.tick_due(now):
+        print(f"\n--- Tick {scheduler.ticks + 1} at {datetime.now()} ---")
+        with scheduler.budget("tick"):
+            run_guarded("tick", run_tick, runtime)
+        scheduler.tick_done(time.time())
+    
+    if scheduler.poll_due(time.time()):
+        with scheduler.budget("poll") as budget:
+            result = run_guarded("poll", poll_commands, runtime, budget)
+        handled, deferred = result or (0, False)
+        if handled:
+            scheduler.mark_changed()
+        scheduler.poll_done(time.time(), handled, deferred)
+    
+    if scheduler.sync_due(time.time()):
+        with scheduler.budget("sync"):
+            ok = run_guarded("sync", sync_lists, runtime)
+        scheduler.sync_done(time.time(), bool(ok))
+    
+    # Checkpoints only use slack time, unless they are badly overdue
+    now = time.time()
+    slack = scheduler.next_deadline() - now
+    if runtime.checkpoint_due() and (slack >= scheduler.budgets["checkpoint"] or runtime.checkpoint_overdue()):
+        with scheduler.budget("checkpoint"):
+            run_guarded("checkpoint", run_checkpoint, runtime)
 
 def main():
-    """Main loop: run 60 iterations, one per minute."""
+    """Run the bot for a fixed number of one-minute ticks, or forever with --daemon."""
+    parser = argparse.ArgumentParser(description="Cave MMO Scratch bot")
+    parser.add_argument("--daemon", action="store_true", help="run until SIGTERM instead of a fixed number of ticks")
+    parser.add_argument("--iterations", type=int, default=60, help="world ticks (minutes) to run when not in daemon mode")
+    args = parser.parse_args()
+    
+    session_id = os.environ.get("SCRATCH_SESSION_ID")
+    if not session_id:
+        print("ERROR: SCRATCH_SESSION_ID not set")
+        return
+    
     print(f"Bot starting at {datetime.now()}")
+    settings = load_settings()
+    if settings.get("metrics_path"):
+        metrics.open(settings["metrics_path"])
+    profiler.configure(settings)
+    runtime = create_runtime(session_id)
+    scheduler = Scheduler(runtime.settings)
     
-    for i in range(60):
-        print(f"\n--- Iteration {i+1}/60 at {datetime.now()} ---")
-        try:
-            run_iteration()
-        except Exception as e:
-            print(f"Error in iteration: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # Wait for next minute (minus processing time)
-        if i < 59:
-            time.sleep(55)  # ~55 seconds, allowing 5 seconds for processing
+    # Finish (including the final checkpoint) before the next scheduled run starts
+    end_at = None
+    if not args.daemon:
+        margin = runtime.settings.get("shutdown_margin_seconds", 30)
+        end_at = scheduler.next_tick + args.iterations * scheduler.tick_seconds - margin
+    
+    stop = False
+    
+    def request_stop(signum, frame):
+        nonlocal stop
+        print(f"Received signal {signum}, stopping after this phase")
+        stop = True
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    try:
+        while not stop and (end_at is None or time.time() < end_at):
+            scheduler.configure(runtime.settings)  # Follow config reloads
+            with profiler.section("iteration", lambda: {"tick": scheduler.ticks}):
+                run_due_phases(runtime, scheduler)
+            metrics.flush(tick=scheduler.ticks)
+            scheduler.wait(lambda: stop, until=end_at)
+    finally:
+        written = runtime.close()
+        print(f"Final checkpoint: saved {len(written)} state file(s)")
+        print(f"Ran {scheduler.ticks} tick(s), skipped {scheduler.skipped_ticks}")
+        metrics.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,172 @@
+"""
+Run metrics: timings and counters for the bot's hot paths.
+
+Code records into the module-level `metrics` instance:
+
+    with metrics.timer("api.get_comments"):
+        ...
+    metrics.count("bfs_nodes_expanded", nodes)
+
+Timings are kept per name for the whole run (the last MAX_SAMPLES of
+each) for an end-of-run summary with percentiles. If a path was given to
+open(), flush() appends one JSON line per iteration with that
+iteration's timings (count, total and max seconds per name) and counter
+deltas, and close() appends the summary as a final line.
+
+Recording is a dict update, so it is left on everywhere; nothing is
+written unless open() was called. The reply sender thread records too,
+so updates are locked.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+MAX_SAMPLES = 10000  # Timing samples kept per name for percentiles
+PERCENTILES = (50, 90, 99)
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: dict[str, deque] = {}
+        self.counters: dict[str, float] = {}
+        self._interval: dict[str, list] = {}  # name -> [count, total, max] since last flush
+        self._counters_flushed: dict[str, float] = {}
+        self.path: Optional[str] = None
+        self.started = time.time()
+    
+    def open(self, path: str):
+        """Append JSON lines to `path` from now on."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+    
+    def observe(self, name: str, seconds: float):
+        """Record one timing sample."""
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=MAX_SAMPLES)
+            samples.append(seconds)
+            interval = self._interval.get(name)
+            if interval is None:
+                self._interval[name] = [1, seconds, seconds]
+            else:
+                interval[0] += 1
+                interval[1] += seconds
+                if seconds > interval[2]:
+                    interval[2] = seconds
+    
+    @contextmanager
+    def timer(self, name: str):
+        """Time the enclosed block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+    
+    def count(self, name: str, amount: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def flush(self, **fields) -> Optional[dict]:
+        """
+        End an iteration: write its timings and counter deltas as one JSON
+        line (if open), then start a new interval. Returns the record, or
+        None if nothing was recorded since the last flush.
+        """
+        with self.lock:
+            deltas = {
+                name: value - self._counters_flushed.get(name, 0)
+                for name, value in self.counters.items()
+                if value != self._counters_flushed.get(name, 0)
+            }
+            if not self._interval and not deltas:
+                return None
+            record = {
+                "type": "iteration",
+                "at": round(time.time(), 3),
+                **fields,
+                "timings": {
+                    name: {"count": c, "total": round(total, 6), "max": round(peak, 6)}
+                    for name, (c, total, peak) in sorted(self._interval.items())
+                },
+                "counters": deltas
+            }
+            self._interval = {}
+            self._counters_flushed = dict(self.counters)
+        self._write(record)
+        return record
+    
+    def summary(self) -> dict:
+        """Per-name count, mean, percentiles and max over the run, plus counter totals."""
+        with self.lock:
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+            counters = dict(self.counters)
+        timings = {}
+        for name, values in sorted(samples.items()):
+            if not values:
+                continue
+            stats = {"count": len(values), "mean": sum(values) / len(values)}
+            for p in PERCENTILES:
+                stats[f"p{p}"] = percentile(values, p)
+            stats["max"] = values[-1]
+            timings[name] = {k: round(v, 6) if isinstance(v, float) else v for k, v in stats.items()}
+        return {
+            "type": "summary",
+            "at": round(time.time(), 3),
+            "duration": round(time.time() - self.started, 3),
+            "timings": timings,
+            "counters": counters
+        }
+    
+    def close(self) -> dict:
+        """Flush, print the run summary and write it as the last line. Returns it."""
+        self.flush()
+        summary = self.summary()
+        self._write(summary)
+        print(format_summary(summary))
+        return summary
+    
+    def reset(self):
+        with self.lock:
+            self.samples = {}
+            self.counters = {}
+            self._interval = {}
+            self._counters_flushed = {}
+            self.started = time.time()
+    
+    def _write(self, record: dict):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+def format_summary(summary: dict) -> str:
+    """Human-readable table of a summary record (milliseconds)."""
+    lines = [f"Metrics over {summary['duration']:.0f}s:"]
+    header = ["name", "count", "mean"] + [f"p{p}" for p in PERCENTILES] + ["max"]
+    lines.append(f"  {header[0]:<32}" + "".join(f"{h:>10}" for h in header[1:]))
+    for name, stats in summary["timings"].items():
+        row = [stats["mean"]] + [stats[f"p{p}"] for p in PERCENTILES] + [stats["max"]]
+        lines.append(f"  {name:<32}{stats['count']:>10}" + "".join(f"{v * 1000:>10.1f}" for v in row))
+    for name, value in sorted(summary["counters"].items()):
+        shown = f"{value:.2f}" if isinstance(value, float) else str(value)
+        lines.append(f"  {name:<32}{shown:>10}")
+    return "\n".join(lines)
+
+metrics = Metrics()
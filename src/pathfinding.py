@@ -1,129 +1,265 @@
 """
 Pathfinding: BFS shortest path through walkable tiles.
 Used for !tp validation and distance calculations.
+
+Searches run on flat tile indexes (y * size + x) using visited/parent
+buffers that are allocated once per world size and reused between calls;
+a generation stamp marks which entries belong to the current search, so
+nothing is cleared or copied per call. Paths are only rebuilt on success.
 """
 
-from collections import deque
-import json
+import heapq
+from array import array
 from typing import Optional
 
-def load_tile_config() -> dict:
-    with open("config/tiles.json", "r") as f:
-        return json.load(f)
+from src.grid import Grid
+from src.metrics import metrics
+from src.regions import get_region_index
+
+class PathEngine:
+    """Reusable search buffers for one world size."""
+    
+    def __init__(self, size: int):
+        n = size * size
+        self.size = size
+        self.stamp = array("I", bytes(4 * n))   # generation that last touched a cell
+        self.parent = array("i", bytes(4 * n))  # previous cell on the path
+        self.dist = array("i", bytes(4 * n))    # steps from the search side's origin
+        self.queue = array("i", bytes(4 * n))   # BFS queue; each cell is enqueued at most once
+        self.generation = 0
+    
+    def _next_generation(self) -> int:
+        """Start a new search. Returns the stamp value to use."""
+        if self.generation + 1 >= 0xFFFFFFFF:
+            self.stamp = array("I", bytes(4 * self.size * self.size))
+            self.generation = 0
+        self.generation += 1
+        return self.generation
+    
+    def _path_to(self, i: int, origin: int) -> list[int]:
+        """Follow parent links from i back to origin. Returns [i, ..., origin]."""
+        parent = self.parent
+        path = [i]
+        while i != origin:
+            i = parent[i]
+            path.append(i)
+        return path
+    
+    def bfs(self, grid: Grid, start: int, end: int, max_steps: Optional[int] = None) -> Optional[list[int]]:
+        """Breadth-first search, optionally limited to max_steps. Returns cell indexes start..end."""
+        if start == end:
+            return [start]
+        
+        size = self.size
+        n = size * size
+        cells = grid.cells
+        walkable = grid.tiles.walkable
+        stamp, parent, dist, queue = self.stamp, self.parent, self.dist, self.queue
+        gen = self._next_generation()
+        
+        stamp[start] = gen
+        dist[start] = 0
+        queue[0] = start
+        head, tail = 0, 1
+        
+        while head < tail:
+            i = queue[head]
+            head += 1
+            d = dist[i] + 1
+            if max_steps is not None and d > max_steps:
+                continue
+            
+            x = i % size
+            for ni in (i - size, i + size, i - 1, i + 1):
+                if ni < 0 or ni >= n:
+                    continue
+                if (ni == i - 1 and x == 0) or (ni == i + 1 and x == size - 1):
+                    continue
+                if stamp[ni] == gen or not walkable[cells[ni]]:
+                    continue
+                stamp[ni] = gen
+                parent[ni] = i
+                if ni == end:
+                    metrics.count("bfs_nodes_expanded", head)
+                    path = self._path_to(ni, start)
+                    path.reverse()
+                    return path
+                dist[ni] = d
+                queue[tail] = ni
+                tail += 1
+        
+        metrics.count("bfs_nodes_expanded", head)
+        return None
+    
+    def astar(self, grid: Grid, start: int, end: int) -> Optional[list[int]]:
+        """A* search with a Manhattan-distance heuristic. Returns cell indexes start..end."""
+        if start == end:
+            return [start]
+        
+        size = self.size
+        n = size * size
+        cells = grid.cells
+        walkable = grid.tiles.walkable
+        stamp, parent, dist = self.stamp, self.parent, self.dist
+        gen = self._next_generation()
+        ex, ey = end % size, end // size
+        
+        stamp[start] = gen
+        dist[start] = 0
+        heap = [(abs(start % size - ex) + abs(start // size - ey), 0, start)]
+        expanded = 0
+        
+        while heap:
+            _, g, i = heapq.heappop(heap)
+            expanded += 1
+            if i == end:
+                metrics.count("bfs_nodes_expanded", expanded)
+                path = self._path_to(end, start)
+                path.reverse()
+                return path
+            if g > dist[i]:
+                continue  # Stale heap entry
+            
+            g += 1
+            x = i % size
+            for ni in (i - size, i + size, i - 1, i + 1):
+                if ni < 0 or ni >= n:
+                    continue
+                if (ni == i - 1 and x == 0) or (ni == i + 1 and x == size - 1):
+                    continue
+                if not walkable[cells[ni]]:
+                    continue
+                if stamp[ni] == gen and dist[ni] <= g:
+                    continue
+                stamp[ni] = gen
+                dist[ni] = g
+                parent[ni] = i
+                h = abs(ni % size - ex) + abs(ni // size - ey)
+                heapq.heappush(heap, (g + h, g, ni))
+        
+        metrics.count("bfs_nodes_expanded", expanded)
+        return None
+
+_engines: dict[int, PathEngine] = {}
+
+def get_engine(size: int) -> PathEngine:
+    """Shared search buffers for a world size."""
+    engine = _engines.get(size)
+    if engine is None:
+        engine = PathEngine(size)
+        _engines[size] = engine
+    return engine
+
+def _endpoints(grid: Grid, start: tuple[int, int], end: tuple[int, int]) -> Optional[tuple[int, int]]:
+    """Validate endpoints. Returns (start index, end index), or None if no path can exist."""
+    size = grid.size
+    sx, sy = start
+    ex, ey = end
+    
+    # Bounds check
+    if not (0 <= sx < size and 0 <= sy < size):
+        return None
+    if not (0 <= ex < size and 0 <= ey < size):
+        return None
+    
+    # Check if end is walkable
+    if not grid.is_walkable(ex, ey):
+        return None
+    
+    # Different connected regions: no search can succeed
+    if grid.is_walkable(sx, sy) and not get_region_index(grid).same_region(start, end):
+        return None
+    
+    return sy * size + sx, ey * size + ex
 
-def is_walkable(tile: int, tiles_config: dict) -> bool:
-    """Check if a tile is walkable."""
-    if tile in tiles_config["floor"]:
-        return True
-    if str(tile) in tiles_config["ore"]:
-        return True
-    if tile in tiles_config.get("hazard", []):
-        return True  # Walkable but harmful
-    return False
+def _to_points(grid: Grid, path: list[int]) -> list[tuple[int, int]]:
+    size = grid.size
+    return [(i % size, i // size) for i in path]
 
 def bfs_shortest_path(
-    grid: list[list[int]],
+    grid: Grid,
     start: tuple[int, int],
     end: tuple[int, int],
-    tiles_config: Optional[dict] = None,
     max_steps: Optional[int] = None
 ) -> Optional[list[tuple[int, int]]]:
     """
-    Find shortest path from start to end using BFS.
+    Find shortest path from start to end.
+    With max_steps (e.g. !tp) this is a depth-bounded BFS that never looks
+    further than max_steps from start; without it A* is used, which on our
+    mazes expands far fewer cells than a plain BFS.
     
     Args:
-        grid: 2D world grid
+        grid: World grid
         start: (x, y) starting position
         end: (x, y) target position
-        tiles_config: Tile configuration dict
         max_steps: Maximum path length allowed (None = unlimited)
     
     Returns:
         List of (x, y) positions from start to end (inclusive), or None if no path.
     """
-    if tiles_config is None:
-        tiles_config = load_tile_config()
-    
-    size = len(grid)
-    sx, sy = start
-    ex, ey = end
-    
-    # Bounds check
-    if not (0 <= sx < size and 0 <= sy < size):
-        return None
-    if not (0 <= ex < size and 0 <= ey < size):
+    endpoints = _endpoints(grid, start, end)
+    if endpoints is None:
         return None
+    s, e = endpoints
     
-    # Check if end is walkable
-    if not is_walkable(grid[ey][ex], tiles_config):
-        return None
-    
-    # BFS
-    queue = deque([(sx, sy, [(sx, sy)])])
-    visited = {(sx, sy)}
-    
-    while queue:
-        x, y, path = queue.popleft()
-        
-        if (x, y) == (ex, ey):
-            return path
-        
-        # Check max steps
-        if max_steps is not None and len(path) > max_steps:
-            continue
-        
-        # Explore neighbors (4-directional)
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            nx, ny = x + dx, y + dy
-            
-            if 0 <= nx < size and 0 <= ny < size:
-                if (nx, ny) not in visited:
-                    if is_walkable(grid[ny][nx], tiles_config):
-                        visited.add((nx, ny))
-                        queue.append((nx, ny, path + [(nx, ny)]))
+    engine = get_engine(grid.size)
+    if max_steps is not None:
+        path = engine.bfs(grid, s, e, max_steps)
+    else:
+        path = engine.astar(grid, s, e)
     
-    return None
+    if path is None:
+        return None
+    return _to_points(grid, path)
 
 def path_distance(
-    grid: list[list[int]],
+    grid: Grid,
     start: tuple[int, int],
-    end: tuple[int, int],
-    tiles_config: Optional[dict] = None
+    end: tuple[int, int]
 ) -> Optional[int]:
     """
     Get shortest path distance between two points.
     Returns number of steps, or None if no path exists.
     """
-    path = bfs_shortest_path(grid, start, end, tiles_config)
+    endpoints = _endpoints(grid, start, end)
+    if endpoints is None:
+        return None
+    path = get_engine(grid.size).astar(grid, *endpoints)
     if path is None:
         return None
     return len(path) - 1  # -1 because path includes start
 
 def find_nearest_valid_tile(
-    grid: list[list[int]],
+    grid: Grid,
     start: tuple[int, int],
     exclude_sector: Optional[tuple[int, int, int, int]] = None,
-    tiles_config: Optional[dict] = None
+    reachable_from: Optional[tuple[int, int]] = None
 ) -> Optional[tuple[int, int]]:
     """
     Spiral search outward from start to find first valid walkable tile.
-    Used for ejection when sector regenerates.
+    For moving many entities out of a sector at once, use eject_from_rect.
     
     Args:
-        grid: 2D world grid
+        grid: World grid
         start: (x, y) starting position
         exclude_sector: (min_x, min_y, max_x, max_y) bounds to exclude
-        tiles_config: Tile configuration dict
+        reachable_from: if set, only accept tiles connected to this position
     
     Returns:
         (x, y) of nearest valid tile, or None if none found.
     """
-    if tiles_config is None:
-        tiles_config = load_tile_config()
-    
-    size = len(grid)
+    size = grid.size
+    cells = grid.cells
+    walkable = grid.tiles.walkable
     sx, sy = start
     
+    target_region = None
+    if reachable_from is not None:
+        regions = get_region_index(grid)
+        target_region = regions.region_at(*reachable_from)
+        if target_region == -1:
+            return None
+    
     # Spiral outward
     for radius in range(0, size):
         for dx in range(-radius, radius + 1):
@@ -142,7 +278,86 @@ def find_nearest_valid_tile(
                     if min_x <= nx <= max_x and min_y <= ny <= max_y:
                         continue
                 
-                if is_walkable(grid[ny][nx], tiles_config):
+                if walkable[cells[ny * size + nx]]:
+                    if target_region is not None and regions.region_at(nx, ny) != target_region:
+                        continue
                     return (nx, ny)
     
     return None
+
+def eject_from_rect(
+    grid: Grid,
+    rect: tuple[int, int, int, int],
+    positions: list[tuple[int, int]],
+    reachable_from: Optional[tuple[int, int]] = None
+) -> list[Optional[tuple[int, int]]]:
+    """
+    Batched ejection for sector regeneration: find, for every position
+    inside rect, the nearest walkable tile just outside it.
+    
+    One multi-source BFS is seeded from every walkable tile bordering the
+    rect (only those connected to `reachable_from`, if given) and spreads
+    inward over the whole rect, walls included, since its tiles are about
+    to be replaced. Each rect tile inherits the exit its wave came from,
+    so any number of entities are placed with a single pass over the rect.
+    
+    Returns one (x, y) per position, or None where there is no exit.
+    """
+    size = grid.size
+    cells = grid.cells
+    walkable = grid.tiles.walkable
+    min_x, min_y, max_x, max_y = rect
+    w = max_x - min_x + 1
+    h = max_y - min_y + 1
+    
+    target_region = None
+    if reachable_from is not None:
+        regions = get_region_index(grid)
+        target_region = regions.region_at(*reachable_from)
+    
+    # exit_of[local index] = flat index of the outside tile the wave came from
+    exit_of = array("i", [-1]) * (w * h)
+    queue = []
+    for y in range(min_y, max_y + 1):
+        for x in range(min_x, max_x + 1):
+            if min_x < x < max_x and min_y < y < max_y:
+                continue
+            local = (y - min_y) * w + (x - min_x)
+            for ox, oy in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                if min_x <= ox <= max_x and min_y <= oy <= max_y:
+                    continue
+                if not (0 <= ox < size and 0 <= oy < size):
+                    continue
+                if not walkable[cells[oy * size + ox]]:
+                    continue
+                if target_region is not None and regions.region_at(ox, oy) != target_region:
+                    continue
+                exit_of[local] = oy * size + ox
+                queue.append(local)
+                break
+    
+    head = 0
+    while head < len(queue):
+        local = queue[head]
+        head += 1
+        lx = local % w
+        source = exit_of[local]
+        for nl, ok in (
+            (local - w, local >= w),
+            (local + w, local + w < w * h),
+            (local - 1, lx > 0),
+            (local + 1, lx < w - 1)
+        ):
+            if ok and exit_of[nl] == -1:
+                exit_of[nl] = source
+                queue.append(nl)
+    metrics.count("bfs_nodes_expanded", head)
+    
+    result = []
+    for x, y in positions:
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            result.append((x, y))
+            continue
+        source = exit_of[(y - min_y) * w + (x - min_x)]
+        result.append(None if source == -1 else (source % size, source // size))
+    return result
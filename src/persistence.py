@@ -0,0 +1,107 @@
+"""
+Dirty-tracked state persistence.
+
+Commands and ticks mark what they mutate (players, creatures, world
+sections); flush() then writes each changed file once, atomically, and
+skips files whose encoded content is identical to what is already on disk.
+"""
+
+import hashlib
+from typing import Iterable, Optional
+
+from src.creatures import CreatureStore
+from src.fileio import atomic_write_bytes, encode_json
+from src.metrics import metrics
+from src.world_gen import save_world
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class StateStore:
+    def __init__(
+        self,
+        world_state: dict,
+        players: dict,
+        entities: dict,
+        players_path: str = "state/players.json",
+        entities_path: str = "state/entities.json",
+        world_path: str = "state/world.bin"
+    ):
+        self.world_state = world_state
+        self.players = players
+        self.entities = entities
+        self.creatures = CreatureStore(entities)
+        self.players_path = players_path
+        self.entities_path = entities_path
+        self.world_path = world_path
+        
+        self.dirty_players: set[str] = set()
+        self.entities_dirty = False
+        self.dirty_sections: set[str] = set()
+        self._digests: dict[str, Optional[bytes]] = {}
+    
+    def mark_player(self, username: str):
+        """Record that a player's data changed."""
+        self.dirty_players.add(username)
+    
+    def mark_players(self, usernames: Iterable[str]):
+        self.dirty_players.update(usernames)
+    
+    def mark_entities(self):
+        """Record that a creature was added, moved, damaged or removed."""
+        self.entities_dirty = True
+    
+    def mark_world(self, section: str):
+        """Record that a world metadata section (e.g. "scouted") changed."""
+        self.dirty_sections.add(section)
+    
+    def is_dirty(self) -> bool:
+        grid = self.world_state["grid"]
+        return bool(
+            self.dirty_players or self.entities_dirty or self.dirty_sections
+            or grid.dirty or grid.all_dirty
+        )
+    
+    def _write_if_changed(self, filepath: str, data: bytes) -> bool:
+        """Write data unless the file already holds exactly these bytes."""
+        digest = _digest(data)
+        if filepath not in self._digests:
+            try:
+                with open(filepath, "rb") as f:
+                    self._digests[filepath] = _digest(f.read())
+            except FileNotFoundError:
+                self._digests[filepath] = None
+        if self._digests[filepath] == digest:
+            return False
+        atomic_write_bytes(filepath, data)
+        self._digests[filepath] = digest
+        return True
+    
+    def flush(self) -> list[str]:
+        """
+        Write every file with pending changes. Called once per iteration
+        or at explicit checkpoints. Returns the paths actually written.
+        """
+        with metrics.timer("save.flush"):
+            return self._flush()
+    
+    def _flush(self) -> list[str]:
+        written = []
+        
+        if self.dirty_players:
+            if self._write_if_changed(self.players_path, encode_json(self.players)):
+                written.append(self.players_path)
+            self.dirty_players.clear()
+        
+        if self.entities_dirty:
+            if self._write_if_changed(self.entities_path, encode_json(self.entities)):
+                written.append(self.entities_path)
+            self.entities_dirty = False
+        
+        grid = self.world_state["grid"]
+        if self.dirty_sections or grid.dirty or grid.all_dirty:
+            save_world(self.world_state, self.world_path, sections_dirty=bool(self.dirty_sections))
+            written.append(self.world_path)
+            self.dirty_sections.clear()
+        
+        return written
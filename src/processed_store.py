@@ -0,0 +1,91 @@
+"""
+Bounded record of processed comments.
+
+A watermark (newest processed comment ID) plus a fixed-size window of
+recently processed IDs replaces the ever-growing list of every ID ever
+seen. Scratch comment IDs increase over time, so any comment at or below
+the watermark has already been handled; the window catches IDs that are
+not numeric or were processed out of order. state/processed.json stays
+the same size no matter how long the bot runs.
+"""
+
+import json
+from collections import deque
+from typing import Iterable, Optional
+
+from src.fileio import atomic_write_json
+from src.ingest import comment_id_key
+
+class ProcessedStore:
+    def __init__(self, window: int = 1000, recent: Iterable = (), watermark: Optional[dict] = None):
+        self.window = window
+        self.recent: deque = deque(maxlen=window)
+        self._recent_set: set = set()
+        self.watermark = watermark
+        self.dirty = False
+        for comment_id in recent:
+            self._remember(comment_id)
+    
+    def _remember(self, comment_id):
+        if comment_id in self._recent_set:
+            return
+        if len(self.recent) == self.window:
+            self._recent_set.discard(self.recent[0])
+        self.recent.append(comment_id)
+        self._recent_set.add(comment_id)
+    
+    def __contains__(self, comment_id) -> bool:
+        if comment_id in self._recent_set:
+            return True
+        if self.watermark is not None:
+            key = comment_id_key(comment_id)
+            return 0 <= key <= self.watermark["id"]
+        return False
+    
+    def __len__(self) -> int:
+        return len(self.recent)
+    
+    def is_seen(self, comment) -> bool:
+        """True if the comment was already handled in an earlier iteration."""
+        return comment.id in self
+    
+    def add(self, comment):
+        """Record a comment as processed and advance the watermark."""
+        self._remember(comment.id)
+        key = comment_id_key(comment.id)
+        if key >= 0 and (self.watermark is None or key > self.watermark["id"]):
+            at = comment.datetime_created
+            self.watermark = {"id": key, "at": str(at) if at else None}
+        self.dirty = True
+    
+    def to_dict(self) -> dict:
+        return {"watermark": self.watermark, "recent": list(self.recent)}
+    
+    def save(self, filepath: str = "state/processed.json"):
+        atomic_write_json(filepath, self.to_dict())
+        self.dirty = False
+    
+    @classmethod
+    def load(cls, filepath: str = "state/processed.json", window: int = 1000) -> "ProcessedStore":
+        """Load the store, migrating the older list / {"ids": [...]} formats."""
+        try:
+            with open(filepath, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(window)
+        
+        if isinstance(data, list):
+            data = {"watermark": None, "ids": data}
+        
+        if "recent" in data:
+            return cls(window, data["recent"], data.get("watermark"))
+        
+        # Older unbounded format: keep the newest IDs and derive a watermark
+        ids = sorted(data.get("ids", []), key=comment_id_key)
+        watermark = data.get("watermark")
+        numeric = [comment_id_key(i) for i in ids if comment_id_key(i) >= 0]
+        if numeric and (watermark is None or numeric[-1] > watermark["id"]):
+            watermark = {"id": numeric[-1], "at": None}
+        store = cls(window, ids[-window:], watermark)
+        store.dirty = True
+        return store
@@ -0,0 +1,160 @@
+"""
+Opt-in profiling of slow commands and iterations.
+
+Code marks what to watch with the module-level `profiler`:
+
+    with profiler.section("command", lambda: {"text": text}):
+        ...
+
+While disabled, section() returns a shared no-op context manager, so a
+watched call costs one attribute check. Once enabled (the
+profiling_enabled setting, BOT_PROFILE=1, or enable() from offline
+tools) the outermost section runs under cProfile. If it takes longer
+than its kind's threshold, the profile is dumped to profile_dir as
+<time>-<kind>-<ms>ms.prof (load with pstats or snakeviz) next to a .json
+file holding the context from `describe` (called on entry) and the top
+functions by cumulative time.
+
+Sections nested in a profiled one (a command inside an iteration) are
+only timed. A slow nested section adds its context to the outer one and
+forces the outer profile to be dumped, so its stacks are still captured.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Callable, Optional
+
+_NULL_SECTION = nullcontext()
+
+DEFAULT_THRESHOLDS_MS = {"command": 500, "iteration": 20000}
+
+class _Section:
+    def __init__(self, profiler: "Profiler", kind: str, describe: Optional[Callable[[], dict]]):
+        self.profiler = profiler
+        self.kind = kind
+        self.describe = describe
+        self.threshold = profiler.thresholds.get(kind, DEFAULT_THRESHOLDS_MS.get(kind, 1000)) / 1000
+        self.profile: Optional[cProfile.Profile] = None
+        self.slow_nested: list[dict] = []
+        self.started = 0.0
+        self.info: dict = {}
+    
+    def __enter__(self) -> "_Section":
+        self.info = self._describe()  # Before the work, e.g. the player's starting position
+        if self.profiler.active is None:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                pass  # Another profiler is running (e.g. python -m cProfile); just time
+            else:
+                self.profile = profile
+                self.profiler.active = self
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        profiler = self.profiler
+        if self.profile is None:
+            outer = profiler.active
+            if outer is not None and elapsed >= self.threshold:
+                outer.slow_nested.append({"kind": self.kind, "ms": round(elapsed * 1000, 1), **self.info})
+            return False
+        
+        self.profile.disable()
+        profiler.active = None
+        if elapsed >= self.threshold or self.slow_nested:
+            profiler.dump(self, elapsed)
+        return False
+    
+    def _describe(self) -> dict:
+        if self.describe is None:
+            return {}
+        try:
+            return self.describe()
+        except Exception as e:
+            return {"describe_error": str(e)}
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.thresholds = dict(DEFAULT_THRESHOLDS_MS)
+        self.directory = "profiles"
+        self.max_dumps = 20
+        self.dumps: list[str] = []
+        self.active: Optional[_Section] = None
+    
+    def enable(
+        self,
+        directory: Optional[str] = None,
+        thresholds_ms: Optional[dict] = None,
+        max_dumps: Optional[int] = None
+    ):
+        """Start profiling sections; thresholds_ms maps section kind to milliseconds."""
+        if directory is not None:
+            self.directory = directory
+        if thresholds_ms:
+            self.thresholds.update(thresholds_ms)
+        if max_dumps is not None:
+            self.max_dumps = max_dumps
+        self.enabled = True
+    
+    def disable(self):
+        self.enabled = False
+    
+    def configure(self, settings: dict):
+        """Enable from settings, or from the BOT_PROFILE environment variable."""
+        if settings.get("profiling_enabled") or os.environ.get("BOT_PROFILE") == "1":
+            self.enable(
+                directory=settings.get("profile_dir", "profiles"),
+                thresholds_ms=settings.get("profile_thresholds_ms"),
+                max_dumps=settings.get("profile_max_dumps", 20)
+            )
+            print(f"Profiling enabled: {self.thresholds} ms thresholds, dumps in {self.directory}/")
+    
+    def section(self, kind: str, describe: Optional[Callable[[], dict]] = None):
+        """Context manager around work to profile. `describe` is only called while enabled."""
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, kind, describe)
+    
+    def dump(self, section: _Section, elapsed: float) -> Optional[str]:
+        """Write a section's profile and context. Returns the .prof path."""
+        if len(self.dumps) >= self.max_dumps:
+            return None
+        ms = round(elapsed * 1000)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.join(self.directory, f"{stamp}-{section.kind}-{ms}ms")
+        
+        stats_text = io.StringIO()
+        stats = pstats.Stats(section.profile, stream=stats_text)
+        stats.sort_stats("cumulative").print_stats(25)
+        
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            section.profile.dump_stats(base + ".prof")
+            with open(base + ".json", "w") as f:
+                json.dump({
+                    "kind": section.kind,
+                    "ms": round(elapsed * 1000, 1),
+                    "threshold_ms": round(section.threshold * 1000),
+                    "context": section.info,
+                    "slow_nested": section.slow_nested,
+                    "top": stats_text.getvalue().splitlines()
+                }, f, indent=2)
+        except OSError as e:
+            print(f"Error writing profile: {e}")
+            return None
+        
+        self.dumps.append(base + ".prof")
+        print(f"Slow {section.kind} ({ms} ms), profile saved to {base}.prof")
+        return base + ".prof"
+
+profiler = Profiler()
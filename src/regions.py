@@ -0,0 +1,170 @@
+"""
+Connected-region index over walkable tiles.
+
+Every walkable tile gets a region label; labels are merged with
+union-find, so "are these two tiles connected?" is an O(1)-ish check
+that lets pathfinding reject unreachable targets without searching.
+Opening a tile (e.g. mining through a wall) merges neighbouring regions
+in place; closing one can split a region, so the index is rebuilt lazily
+on the next query.
+"""
+
+from array import array
+
+from src.grid import Grid
+
+class RegionIndex:
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        self.labels = array("i")
+        self.parent: list[int] = []  # union-find parent per label
+        self.sizes: list[int] = []   # tile count per root label
+        self.stale = True
+        self.rebuild()
+        grid.walkability_listeners.append(self._on_walkability_change)
+    
+    def rebuild(self):
+        """Flood-fill label every walkable tile."""
+        grid = self.grid
+        size = grid.size
+        n = size * size
+        cells = grid.cells
+        walkable = grid.tiles.walkable
+        labels = array("i", [-1]) * n
+        parent = []
+        sizes = []
+        stack = []
+        
+        for start in range(n):
+            if labels[start] != -1 or not walkable[cells[start]]:
+                continue
+            label = len(parent)
+            parent.append(label)
+            labels[start] = label
+            count = 1
+            stack.append(start)
+            while stack:
+                i = stack.pop()
+                x = i % size
+                for ni in (i - size, i + size, i - 1, i + 1):
+                    if ni < 0 or ni >= n:
+                        continue
+                    if (ni == i - 1 and x == 0) or (ni == i + 1 and x == size - 1):
+                        continue
+                    if labels[ni] != -1 or not walkable[cells[ni]]:
+                        continue
+                    labels[ni] = label
+                    count += 1
+                    stack.append(ni)
+            sizes.append(count)
+        
+        self.labels = labels
+        self.parent = parent
+        self.sizes = sizes
+        self.stale = False
+    
+    def _find(self, label: int) -> int:
+        parent = self.parent
+        root = label
+        while parent[root] != root:
+            root = parent[root]
+        while parent[label] != root:
+            parent[label], label = root, parent[label]
+        return root
+    
+    def _union(self, a: int, b: int) -> int:
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return ra
+        if self.sizes[ra] < self.sizes[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.sizes[ra] += self.sizes[rb]
+        self.sizes[rb] = 0
+        return ra
+    
+    def _on_walkability_change(self, i: int, now_walkable: bool):
+        if self.stale:
+            return
+        if not now_walkable:
+            # A closed tile may split its region; relabel on next query
+            self.stale = True
+            return
+        
+        size = self.grid.size
+        x = i % size
+        root = None
+        for ni in (i - size, i + size, i - 1, i + 1):
+            if ni < 0 or ni >= len(self.labels):
+                continue
+            if (ni == i - 1 and x == 0) or (ni == i + 1 and x == size - 1):
+                continue
+            label = self.labels[ni]
+            if label == -1:
+                continue
+            root = label if root is None else self._union(root, label)
+        
+        if root is None:
+            root = len(self.parent)
+            self.parent.append(root)
+            self.sizes.append(0)
+        root = self._find(root)
+        self.labels[i] = root
+        self.sizes[root] += 1
+    
+    def region_at(self, x: int, y: int) -> int:
+        """Region id of a tile, or -1 if it is not walkable."""
+        if self.stale:
+            self.rebuild()
+        label = self.labels[y * self.grid.size + x]
+        return -1 if label == -1 else self._find(label)
+    
+    def same_region(self, a: tuple[int, int], b: tuple[int, int]) -> bool:
+        """True if both tiles are walkable and connected."""
+        ra = self.region_at(*a)
+        return ra != -1 and ra == self.region_at(*b)
+    
+    def region_size(self, x: int, y: int) -> int:
+        region = self.region_at(x, y)
+        return 0 if region == -1 else self.sizes[region]
+    
+    def region_count(self) -> int:
+        if self.stale:
+            self.rebuild()
+        return sum(1 for label, parent in enumerate(self.parent) if label == parent)
+
+def get_region_index(grid: Grid) -> RegionIndex:
+    """The grid's region index, built on first use and kept in sync afterwards."""
+    index = grid.indexes.get("regions")
+    if index is None:
+        index = RegionIndex(grid)
+        grid.indexes["regions"] = index
+    return index
+
+def connected(grid: Grid, a: tuple[int, int], b: tuple[int, int]) -> bool:
+    """True if a and b are in the same walkable region."""
+    return get_region_index(grid).same_region(a, b)
+
+def connectivity_report(grid: Grid, hub: tuple[int, int]) -> dict:
+    """
+    Summarise connectivity: how many walkable tiles exist, how many are
+    reachable from the hub, and the sizes of the other regions.
+    """
+    index = get_region_index(grid)
+    index.region_at(*hub)  # Rebuild if stale
+    walkable = sum(index.sizes)
+    hub_region = index.region_at(*hub)
+    reachable = index.sizes[hub_region] if hub_region != -1 else 0
+    others = sorted(
+        (index.sizes[label] for label, parent in enumerate(index.parent)
+         if label == parent and label != hub_region),
+        reverse=True
+    )
+    return {
+        "walkable_tiles": walkable,
+        "reachable_from_hub": reachable,
+        "unreachable_tiles": walkable - reachable,
+        "regions": len(others) + (1 if hub_region != -1 else 0),
+        "largest_isolated_regions": others[:10],
+        "fully_connected": reachable == walkable
+    }
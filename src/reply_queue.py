@@ -0,0 +1,187 @@
+"""
+Background reply pipeline: a token-bucket rate limiter shared with the
+Scratch API, and a sender thread that posts queued replies, retrying
+rate-limit and server errors with exponential backoff.
+"""
+
+import heapq
+import itertools
+import re
+import threading
+import time
+from typing import Optional
+
+from src.metrics import metrics
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Error texts that mean rate limiting even without a status code
+RETRYABLE_MARKERS = ("rate limit", "ratelimit", "too many requests")
+
+# A status code at the start of the message ("429 Too Many Requests") or
+# right after "HTTP", "status", "code", "error" or "response"; a bare
+# number elsewhere (a comment or project id) does not count
+STATUS_PATTERN = re.compile(
+    r"(?:^|\b(?:http(?:/[\d.]+)?|status(?:[ _]code)?|code|error|response))\W{0,3}([1-5]\d\d)\b",
+    re.IGNORECASE
+)
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status of an API error, from its attributes or its message."""
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    match = STATUS_PATTERN.search(str(error).strip())
+    return int(match.group(1)) if match else None
+
+def is_retryable_error(error: Exception) -> bool:
+    """True if an API error is transient (rate limit or server error)."""
+    if error_status(error) in RETRYABLE_STATUSES:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Refills `rate` tokens per second up to
+    `capacity`; acquire() blocks until a token is available.
+    """
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.total_wait = 0.0
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def try_acquire(self) -> bool:
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+    
+    def acquire(self) -> float:
+        """Take one token, sleeping as needed. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.total_wait += waited
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class ReplySender:
+    """
+    Posts replies from a background thread so command processing does not
+    wait on the network. Jobs are (comment, content); `comment` is the
+    object returned by get_comments, so no extra lookup is needed.
+    """
+    
+    def __init__(self, api, max_retries: int = 5, backoff_base: float = 2.0, backoff_max: float = 60.0):
+        self.api = api
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        
+        self._heap: list = []  # (ready_at, seq, comment, content, attempt)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        
+        self._thread = threading.Thread(target=self._run, name="reply-sender", daemon=True)
+        self._thread.start()
+    
+    def submit(self, comment, content: str):
+        """Queue a reply and return immediately."""
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic(), next(self._seq), comment, content, 0))
+            self._cond.notify_all()
+    
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap) + self._in_flight
+    
+    def _next_job(self) -> Optional[tuple]:
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None  # close() already drained; abandon leftovers
+                if self._heap:
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        self._in_flight += 1
+                        return heapq.heappop(self._heap)
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+    
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            _, _, comment, content, attempt = job
+            requeue = None
+            try:
+                self.api.post_reply(comment, content)
+                self.sent += 1
+                metrics.count("replies_sent")
+            except Exception as e:
+                comment_id = getattr(comment, "id", comment)
+                if is_retryable_error(e) and attempt < self.max_retries:
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                    print(f"Reply to {comment_id} failed ({e}), retrying in {delay:.0f}s")
+                    requeue = (time.monotonic() + delay, next(self._seq), comment, content, attempt + 1)
+                    self.retried += 1
+                    metrics.count("replies_retried")
+                else:
+                    print(f"Failed to reply to {comment_id}: {e}")
+                    self.failed += 1
+                    metrics.count("replies_failed")
+            with self._cond:
+                if requeue is not None:
+                    heapq.heappush(self._heap, requeue)
+                self._in_flight -= 1
+                self._cond.notify_all()
+    
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued reply is sent or abandoned. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._in_flight:
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+        return True
+    
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Drain the queue, then stop the sender thread."""
+        drained = self.drain(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+        return drained
@@ -0,0 +1,122 @@
+"""
+Runtime context kept resident across iterations: settings, the Scratch
+connection, and the world/player/entity/processed state. State is written
+to disk at checkpoints rather than reloaded and resaved every minute.
+"""
+
+import time
+from typing import Optional
+
+from src.config import get_config
+from src.scratch_api import ScratchAPI
+from src.world_gen import generate_world, load_world, save_world, new_world_state
+from src.commands import CommandHandler, load_players, load_entities
+from src.processed_store import ProcessedStore
+from src.ingest import ScanCursor
+from src.persistence import StateStore
+from src.regions import connectivity_report, get_region_index
+from src.metrics import metrics
+from src.reply_queue import ReplySender
+
+def load_settings() -> dict:
+    return get_config().settings
+
+class Runtime:
+    def __init__(self, api: ScratchAPI, overrides: Optional[dict] = None):
+        self.overrides = overrides or {}
+        self._config = None
+        self._settings: dict = {}
+        settings = self.settings
+        self.api = api
+        self.replies = ReplySender(api)
+        
+        # Load or generate world
+        with metrics.timer("load.world"):
+            world_data = load_world()
+        if world_data is None:
+            print("Generating new world...")
+            world_data = new_world_state(generate_world())
+            save_world(world_data)
+            report = connectivity_report(world_data["grid"], tuple(settings["hub_center"]))
+            print(f"World connectivity: {report}")
+        self.world_data = world_data
+        self.grid = world_data["grid"]
+        get_region_index(self.grid)
+        
+        # Load player/entity state
+        with metrics.timer("load.players"):
+            self.players = load_players()
+        with metrics.timer("load.entities"):
+            self.entities = load_entities()
+        self.store = StateStore(self.world_data, self.players, self.entities)
+        self.handler = CommandHandler(self.world_data, self.grid, self.store)
+        
+        # Load processed comments
+        with metrics.timer("load.processed"):
+            self.processed = ProcessedStore.load(window=settings.get("processed_window", 1000))
+        self.comment_scan = ScanCursor()
+        
+        self.last_checkpoint = time.time()
+    
+    @property
+    def settings(self) -> dict:
+        """Current settings, following config reloads, with `overrides` on top."""
+        config = get_config()
+        if config is not self._config:
+            self._config = config
+            self._settings = {**config.settings, **self.overrides}
+        return self._settings
+    
+    @property
+    def checkpoint_interval(self) -> float:
+        return self.settings.get("checkpoint_minutes", 5) * 60
+    
+    def mark_processed(self, comment):
+        self.processed.add(comment)
+    
+    def checkpoint_due(self) -> bool:
+        return time.time() - self.last_checkpoint >= self.checkpoint_interval
+    
+    def checkpoint_overdue(self) -> bool:
+        """Due for twice the interval: write even if it delays other work."""
+        return time.time() - self.last_checkpoint >= 2 * self.checkpoint_interval
+    
+    def checkpoint(self) -> list[str]:
+        """Write all pending state to disk. Returns the files written."""
+        written = self.store.flush()
+        if self.processed.dirty:
+            with metrics.timer("save.processed"):
+                self.processed.save()
+            written.append("state/processed.json")
+        self.last_checkpoint = time.time()
+        return written
+    
+    def close(self, timeout: float = 30.0):
+        """Let queued replies drain, then write a final checkpoint."""
+        if not self.replies.close(timeout):
+            print(f"Gave up on {self.replies.pending()} unsent replies")
+        return self.checkpoint()
+    
+    def ensure_logged_in(self):
+        """Log in again if the last API call failed authentication."""
+        if self.api.auth_failed:
+            print("Scratch session rejected, logging in again")
+            self.api.login()
+
+def create_runtime(session_id: str, overrides: Optional[dict] = None, backend=None) -> Runtime:
+    """
+    Log in once and load all state into memory. `overrides` replace
+    settings from config/settings.json for this runtime only. `backend`
+    picks the Scratch connection (default: the real site through
+    scratchattach).
+    """
+    settings = {**load_settings(), **(overrides or {})}
+    api = ScratchAPI(
+        session_id,
+        settings["project_id"],
+        rate_limit=settings["rate_limit_seconds"],
+        rate_limit_burst=settings.get("rate_limit_burst", 3),
+        project_cache_max_age=settings.get("project_cache_max_age_minutes", 60) * 60,
+        backend=backend
+    )
+    return Runtime(api, overrides)
@@ -0,0 +1,139 @@
+"""
+Deadline-based iteration scheduling.
+
+Work is split into phases that run on their own wall-clock deadlines
+instead of once per fixed sleep:
+
+    tick        world tick, every tick_seconds on a fixed grid of deadlines
+                (a late tick does not push the next one back; missed ticks
+                are skipped, not replayed back to back)
+    poll        fetch and handle new comments, at an adaptive interval that
+                drops to poll_min_seconds while comments are arriving and
+                backs off towards poll_max_seconds while the project is idle
+    sync        push Scratch lists, only when something changed and at most
+                once per sync_min_seconds
+    checkpoint  write state, in slack time once checkpoint_minutes passed
+
+Each phase is timed against phase_budgets_seconds. Command handling stops
+when its budget runs out and the rest of the batch is picked up by an
+immediate re-poll, so one burst can't hold the tick or the list sync
+hostage.
+"""
+
+import time
+from typing import Callable, Optional
+
+from src.metrics import metrics
+
+DEFAULT_BUDGETS = {"tick": 5.0, "poll": 20.0, "sync": 15.0, "checkpoint": 5.0}
+
+class PhaseBudget:
+    """Time one phase against its budget."""
+    
+    def __init__(self, name: str, budget: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.budget = budget
+        self.clock = clock
+        self.started = 0.0
+        self.elapsed = 0.0
+    
+    def __enter__(self) -> "PhaseBudget":
+        self.started = self.clock()
+        return self
+    
+    def __exit__(self, *exc):
+        self.elapsed = self.clock() - self.started
+        metrics.observe(f"phase.{self.name}", self.elapsed)
+        if self.elapsed > self.budget:
+            print(f"Phase {self.name} took {self.elapsed:.1f}s (budget {self.budget:.1f}s)")
+        return False
+    
+    def remaining(self) -> float:
+        return self.budget - (self.clock() - self.started)
+    
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+class Scheduler:
+    def __init__(self, settings: dict, now: Optional[float] = None):
+        if now is None:
+            now = time.time()
+        self.poll_interval = 0.0  # Clamped up to poll_min_seconds by configure()
+        self.configure(settings)
+        
+        self.next_tick = now
+        self.next_poll = now
+        self.last_sync = 0.0
+        self.sync_pending = True  # Publish once at startup
+        self.ticks = 0
+        self.skipped_ticks = 0
+    
+    def configure(self, settings: dict):
+        """Take intervals and budgets from settings; cheap enough to call every iteration."""
+        self.tick_seconds = settings.get("tick_seconds", 60)
+        self.poll_min = settings.get("poll_min_seconds", 5)
+        self.poll_max = settings.get("poll_max_seconds", 30)
+        self.poll_backoff = settings.get("poll_backoff", 1.5)
+        self.sync_min = settings.get("sync_min_seconds", 5)
+        self.budgets = {**DEFAULT_BUDGETS, **settings.get("phase_budgets_seconds", {})}
+        self.poll_interval = max(self.poll_min, min(self.poll_max, self.poll_interval))
+    
+    def budget(self, phase: str) -> PhaseBudget:
+        return PhaseBudget(phase, self.budgets[phase])
+    
+    def tick_due(self, now: float) -> bool:
+        return now >= self.next_tick
+    
+    def tick_done(self, now: float):
+        """Advance to the next tick deadline, skipping any that already passed."""
+        self.ticks += 1
+        self.next_tick += self.tick_seconds
+        if self.next_tick <= now:
+            missed = int((now - self.next_tick) // self.tick_seconds) + 1
+            self.skipped_ticks += missed
+            self.next_tick += missed * self.tick_seconds
+            print(f"Behind schedule, skipped {missed} tick(s)")
+        self.sync_pending = True
+    
+    def poll_due(self, now: float) -> bool:
+        return now >= self.next_poll
+    
+    def poll_done(self, now: float, handled: int, deferred: bool):
+        """Pick the next poll time from what this poll found."""
+        if deferred:
+            self.next_poll = now  # Budget ran out mid-batch: finish it right away
+            return
+        if handled:
+            self.poll_interval = self.poll_min
+        else:
+            self.poll_interval = min(self.poll_max, self.poll_interval * self.poll_backoff)
+        self.next_poll = now + self.poll_interval
+    
+    def mark_changed(self):
+        self.sync_pending = True
+    
+    def sync_due(self, now: float) -> bool:
+        return self.sync_pending and now - self.last_sync >= self.sync_min
+    
+    def sync_done(self, now: float, ok: bool = True):
+        """Record a sync attempt; a failed one is retried after sync_min_seconds."""
+        self.sync_pending = not ok
+        self.last_sync = now
+    
+    def next_deadline(self) -> float:
+        """Earliest time any phase becomes due."""
+        deadline = min(self.next_tick, self.next_poll)
+        if self.sync_pending:
+            deadline = min(deadline, self.last_sync + self.sync_min)
+        return deadline
+    
+    def wait(self, should_stop: Callable[[], bool], until: Optional[float] = None):
+        """Sleep until the next deadline (or `until`), waking every second to check should_stop."""
+        deadline = self.next_deadline()
+        if until is not None:
+            deadline = min(deadline, until)
+        while not should_stop():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(1.0, remaining))
@@ -0,0 +1,212 @@
+"""
+Scouted-tile map (fog of war).
+
+One bit per tile says whether it has been scouted; parallel per-tile
+arrays hold who scouted it (an index into `owners`) and when (unix
+seconds, 0 if unknown). Stored in the world file as one raw, zlib
+compressed section: the bitset followed by owner and time for the
+scouted tiles only, in index order, so an unscouted world costs a few
+hundred bytes rather than 6 bytes per tile.
+
+The map can also be published as GRID layer 1 (indices size*size to
+2*size*size - 1): `layer` is kept up to date as tiles are scouted, with
+1 for scouted tiles and "" for the rest.
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterable, Optional
+
+# Sparse format: SPARSE_MAGIC, then zlib data starting with
+# SPARSE_HEADER (size, owner-name bytes, scouted count)
+SPARSE_MAGIC = b"SCT2"
+SPARSE_HEADER = struct.Struct("<III")
+# Older dense format (owner and time for every tile): size, owner-name bytes
+BLOB_HEADER = struct.Struct("<II")
+
+class ScoutedMap:
+    def __init__(self, size: int):
+        self.size = size
+        n = size * size
+        self.bits = bytearray((n + 7) // 8)
+        self.owner = array("H", bytes(2 * n))
+        self.time = array("I", bytes(4 * n))
+        self.owners: list[str] = [""]  # index 0 = nobody
+        self._owner_ids: dict[str, int] = {"": 0}
+        self.count = 0
+        self._layer: Optional[list] = None
+    
+    def __contains__(self, i: int) -> bool:
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def is_scouted(self, x: int, y: int) -> bool:
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            return False
+        return (y * self.size + x) in self
+    
+    def scouted_by(self, x: int, y: int) -> Optional[tuple[str, int]]:
+        """(player name, unix time) for a scouted tile, or None."""
+        i = y * self.size + x
+        if i not in self:
+            return None
+        return self.owners[self.owner[i]], self.time[i]
+    
+    def _owner_id(self, name: str) -> int:
+        owner_id = self._owner_ids.get(name)
+        if owner_id is None:
+            owner_id = len(self.owners)
+            self.owners.append(name)
+            self._owner_ids[name] = owner_id
+        return owner_id
+    
+    def unscouted(self, tiles: Iterable[int]) -> array:
+        """The flat indices from `tiles` that have not been scouted yet."""
+        bits = self.bits
+        return array("i", (i for i in tiles if not bits[i >> 3] & (1 << (i & 7))))
+    
+    def add(self, tiles: Iterable[int], player_name: str, at: int = 0) -> array:
+        """Mark flat tile indices as scouted. Returns the ones that were new."""
+        bits = self.bits
+        owner = self.owner
+        time = self.time
+        layer = self._layer
+        owner_id = self._owner_id(player_name)
+        added = array("i")
+        for i in tiles:
+            mask = 1 << (i & 7)
+            if bits[i >> 3] & mask:
+                continue
+            bits[i >> 3] |= mask
+            owner[i] = owner_id
+            time[i] = at
+            if layer is not None:
+                layer[i] = 1
+            added.append(i)
+        self.count += len(added)
+        return added
+    
+    def forget(self, tiles: Iterable[int]):
+        """Mark flat tile indices as unscouted again (e.g. after terrain changes)."""
+        bits = self.bits
+        layer = self._layer
+        for i in tiles:
+            mask = 1 << (i & 7)
+            if not bits[i >> 3] & mask:
+                continue
+            bits[i >> 3] &= ~mask & 0xFF
+            self.owner[i] = 0
+            self.time[i] = 0
+            if layer is not None:
+                layer[i] = ""
+            self.count -= 1
+    
+    @property
+    def layer(self) -> list:
+        """GRID layer values: 1 where scouted, "" elsewhere. Built once, then kept in sync."""
+        if self._layer is None:
+            bits = self.bits
+            self._layer = [
+                1 if bits[i >> 3] & (1 << (i & 7)) else ""
+                for i in range(self.size * self.size)
+            ]
+        return self._layer
+    
+    def indices(self) -> array:
+        """Flat indices of all scouted tiles, ascending."""
+        out = array("i")
+        for byte_index, byte in enumerate(self.bits):
+            if byte:
+                base = byte_index << 3
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        out.append(base + bit)
+        return out
+    
+    def to_bytes(self) -> bytes:
+        names = json.dumps(self.owners[1:], separators=(",", ":")).encode("utf-8")
+        scouted = self.indices()
+        owner = array("H", (self.owner[i] for i in scouted))
+        time = array("I", (self.time[i] for i in scouted))
+        if sys.byteorder != "little":
+            owner.byteswap()
+            time.byteswap()
+        payload = b"".join((
+            SPARSE_HEADER.pack(self.size, len(names), len(scouted)),
+            names,
+            bytes(self.bits),
+            owner.tobytes(),
+            time.tobytes()
+        ))
+        return SPARSE_MAGIC + zlib.compress(payload)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ScoutedMap":
+        if data[:len(SPARSE_MAGIC)] == SPARSE_MAGIC:
+            return cls._from_sparse(zlib.decompress(data[len(SPARSE_MAGIC):]))
+        return cls._from_dense(data)
+    
+    @classmethod
+    def _from_sparse(cls, data: bytes) -> "ScoutedMap":
+        size, names_len, count = SPARSE_HEADER.unpack_from(data, 0)
+        scouted = cls(size)
+        offset = SPARSE_HEADER.size
+        for name in json.loads(data[offset:offset + names_len]):
+            scouted._owner_id(name)
+        offset += names_len
+        bits_len = len(scouted.bits)
+        scouted.bits[:] = data[offset:offset + bits_len]
+        offset += bits_len
+        owner = array("H", data[offset:offset + 2 * count])
+        offset += 2 * count
+        time = array("I", data[offset:offset + 4 * count])
+        if sys.byteorder != "little":
+            owner.byteswap()
+            time.byteswap()
+        for k, i in enumerate(scouted.indices()):
+            scouted.owner[i] = owner[k]
+            scouted.time[i] = time[k]
+        scouted.count = count
+        return scouted
+    
+    @classmethod
+    def _from_dense(cls, data: bytes) -> "ScoutedMap":
+        size, names_len = BLOB_HEADER.unpack_from(data, 0)
+        scouted = cls(size)
+        n = size * size
+        offset = BLOB_HEADER.size
+        for name in json.loads(data[offset:offset + names_len]):
+            scouted._owner_id(name)
+        offset += names_len
+        bits_len = len(scouted.bits)
+        scouted.bits[:] = data[offset:offset + bits_len]
+        offset += bits_len
+        scouted.owner = array("H", data[offset:offset + 2 * n])
+        offset += 2 * n
+        scouted.time = array("I", data[offset:offset + 4 * n])
+        if sys.byteorder != "little":
+            scouted.owner.byteswap()
+            scouted.time.byteswap()
+        scouted.count = sum(bin(b).count("1") for b in scouted.bits)
+        return scouted
+    
+    @classmethod
+    def from_dict(cls, data: dict, size: int) -> "ScoutedMap":
+        """Convert the old {"x,y": {"by": name, "at": time}} format."""
+        scouted = cls(size)
+        for key, info in data.items():
+            x, y = (int(v) for v in key.split(","))
+            info = info or {}
+            scouted.add((y * size + x,), info.get("by") or "", int(info.get("at") or 0))
+        return scouted
+
+def load_scouted(value, size: int) -> ScoutedMap:
+    """Build a ScoutedMap from a world file section in either format."""
+    if isinstance(value, (bytes, bytearray)):
+        return ScoutedMap.from_bytes(value)
+    return ScoutedMap.from_dict(value or {}, size)
@@ -1,111 +1,290 @@
 """
-Scratch API wrapper using scratchattach.
+Scratch API wrapper.
 Handles reading comments, posting replies, and updating project lists.
+
+The connection comes from a pluggable backend: ScratchattachBackend talks
+to Scratch through scratchattach, src/fake_scratch.FakeBackend serves an
+in-process fake project for offline runs and load tests. A backend's
+connect() returns (session, project); the project must provide
+comments(limit, offset), comment_by_id(id), raw_json() and set_json(json),
+and comments must provide reply(content).
 """
 
+import hashlib
+import os
 import time
 import json
-import scratchattach as sa
 from typing import Optional
 
+from src.fileio import atomic_write_json, encode_json
+from src.metrics import metrics
+from src.reply_queue import TokenBucket, error_status
+
+# scratchattach exception class names that mean the session is no longer valid
+AUTH_ERROR_NAMES = {"Unauthorized", "Unauthenticated", "LoginFailure"}
+
+def is_auth_error(error: Exception) -> bool:
+    """True if an API error means we need to log in again."""
+    if type(error).__name__ in AUTH_ERROR_NAMES:
+        return True
+    return error_status(error) in (401, 403)
+
+class ScratchattachBackend:
+    """The real Scratch site, through scratchattach."""
+    
+    def __init__(self, username: str = "scratchcord_bot"):
+        self.username = username
+    
+    def connect(self, session_id: str, project_id: int):
+        import scratchattach as sa
+        session = sa.login(self.username, session_id)
+        return session, session.connect_project(project_id)
+
+def list_digest(contents: list) -> str:
+    """Content hash of a list, used to detect lists that need uploading."""
+    return hashlib.blake2b(encode_json(contents), digest_size=16).hexdigest()
+
 class ScratchAPI:
-    def __init__(self, session_id: str, project_id: int, rate_limit: float = 1.0):
-        self.session = sa.login("scratchcord_bot", session_id)
-        self.project = self.session.connect_project(project_id)
+    def __init__(
+        self,
+        session_id: str,
+        project_id: int,
+        rate_limit: float = 1.0,
+        rate_limit_burst: float = 1.0,
+        sync_state_path: str = "state/scratch_sync.json",
+        project_cache_path: str = ".cache/project.json",
+        project_cache_max_age: float = 3600.0,
+        backend=None
+    ):
+        self.session_id = session_id
         self.project_id = project_id
+        self.backend = backend if backend is not None else ScratchattachBackend()
+        self.auth_failed = False
+        self.login()
         self.rate_limit = rate_limit
-        self.last_request_time = 0.0
+        # Shared by the main thread and the background reply sender
+        self.rate_limiter = TokenBucket(1.0 / rate_limit if rate_limit > 0 else 1e9, rate_limit_burst)
         self._list_id_cache: dict[str, str] = {}
+        
+        # Diffing sync: the project JSON as last uploaded and a hash of every
+        # list it contains. Hashes and the time the project was last
+        # downloaded persist across runs in sync_state_path; the (large)
+        # project JSON is cached outside state/ in project_cache_path.
+        # project_cache_max_age counts from that download, not from our own
+        # uploads, so edits made on Scratch are picked up at least that often.
+        self.sync_state_path = sync_state_path
+        self.project_cache_path = project_cache_path
+        self.project_cache_max_age = project_cache_max_age
+        self._project_json: Optional[dict] = None
+        self._project_stale = False
+        sync_state = self._load_sync_state()
+        self._list_hashes: dict[str, str] = sync_state.get("list_hashes", {})
+        self._project_json_time = sync_state.get("downloaded_at", 0.0)
+    
+    def login(self):
+        """Log in and connect to the project. Called again after an auth failure."""
+        self.session, self.project = self.backend.connect(self.session_id, self.project_id)
+        self.auth_failed = False
+    
+    def _record_error(self, error: Exception):
+        if is_auth_error(error):
+            self.auth_failed = True
     
     def _wait_for_rate_limit(self):
         """Ensure we don't exceed rate limit."""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.rate_limit:
-            time.sleep(self.rate_limit - elapsed)
-        self.last_request_time = time.time()
+        waited = self.rate_limiter.acquire()
+        if waited:
+            metrics.count("rate_limit_wait_seconds", waited)
     
-    def get_comments(self, limit: int = 40, offset: int = 0) -> list:
-        """Fetch project comments."""
+    def get_comments(self, limit: int = 40, offset: int = 0) -> Optional[list]:
+        """Fetch project comments. Returns None on error ([] means no more comments)."""
         self._wait_for_rate_limit()
         try:
-            comments = self.project.comments(limit=limit, offset=offset)
+            with metrics.timer("api.get_comments"):
+                comments = self.project.comments(limit=limit, offset=offset)
             return comments
         except Exception as e:
             print(f"Error fetching comments: {e}")
-            return []
+            self._record_error(e)
+            return None
     
-    def reply_to_comment(self, comment_id: str, content: str) -> bool:
-        """Reply to a specific comment."""
+    def post_reply(self, comment, content: str):
+        """
+        Reply to a comment, raising on failure.
+        `comment` is a comment object from get_comments (preferred, no extra
+        request) or a comment ID to look up.
+        """
+        if not hasattr(comment, "reply"):
+            self._wait_for_rate_limit()
+            try:
+                comment = self.project.comment_by_id(comment)
+            except Exception as e:
+                self._record_error(e)
+                raise
+            if not comment:
+                raise LookupError("comment not found")
         self._wait_for_rate_limit()
         try:
-            comment = self.project.comment_by_id(comment_id)
-            if comment:
+            with metrics.timer("api.post_reply"):
                 comment.reply(content)
-                return True
         except Exception as e:
-            print(f"Error replying to comment {comment_id}: {e}")
+            self._record_error(e)
+            raise
+    
+    def reply_to_comment(self, comment, content: str) -> bool:
+        """Reply to a specific comment (object or ID). Returns True on success."""
+        try:
+            self.post_reply(comment, content)
+            return True
+        except Exception as e:
+            print(f"Error replying to comment {getattr(comment, 'id', comment)}: {e}")
         return False
     
     def get_project_json(self) -> Optional[dict]:
         """Download and return the project JSON."""
         self._wait_for_rate_limit()
         try:
-            return self.project.raw_json()
+            with metrics.timer("api.get_project_json"):
+                return self.project.raw_json()
         except Exception as e:
             print(f"Error getting project JSON: {e}")
+            self._record_error(e)
             return None
     
-    def _build_list_id_cache(self, project_json: dict):
-        """Build a mapping of list names to their IDs."""
+    def _load_sync_state(self) -> dict:
+        try:
+            with open(self.sync_state_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def _load_cached_project_json(self) -> Optional[dict]:
+        """Last uploaded project JSON from disk, if downloaded recently enough."""
+        if time.time() - self._project_json_time > self.project_cache_max_age:
+            return None
+        try:
+            with open(self.project_cache_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def mark_stale(self):
+        """Forget the cached project JSON so the next sync re-downloads it."""
+        self._project_json = None
+        self._project_stale = True
         self._list_id_cache = {}
+    
+    def _current_project_json(self) -> Optional[dict]:
+        """
+        Project JSON to apply list changes to. Uses the in-memory or on-disk
+        copy of what we last uploaded, and only downloads when that copy is
+        missing, too old, or known to be stale after a failed upload.
+        """
+        if self._project_json is not None:
+            if time.time() - self._project_json_time <= self.project_cache_max_age:
+                return self._project_json
+            self.mark_stale()
+        
+        project_json = None if self._project_stale else self._load_cached_project_json()
+        if project_json is None:
+            project_json = self.get_project_json()
+            if not project_json:
+                return None
+            self._project_json_time = time.time()
+            # Diff against what the server actually holds from now on
+            self._list_hashes = {
+                list_data[0]: list_digest(list_data[1])
+                for list_data in self._stage_lists(project_json).values()
+                if isinstance(list_data, list) and len(list_data) >= 2
+            }
+            self._save_sync_state(project_json)
+        
+        self._project_json = project_json
+        self._project_stale = False
+        self._build_list_id_cache(project_json)
+        return project_json
+    
+    def _stage_lists(self, project_json: dict) -> dict:
+        """The stage's lists dict ({list_id: [name, values]}) of a project JSON."""
         for target in project_json.get("targets", []):
             if target.get("isStage", False):
-                lists = target.get("lists", {})
-                for list_id, list_data in lists.items():
-                    if isinstance(list_data, list) and len(list_data) >= 1:
-                        list_name = list_data[0]
-                        self._list_id_cache[list_name] = list_id
-                break
+                return target.get("lists", {})
+        return {}
+    
+    def _build_list_id_cache(self, project_json: dict):
+        """Build a mapping of list names to their IDs."""
+        self._list_id_cache = {}
+        for list_id, list_data in self._stage_lists(project_json).items():
+            if isinstance(list_data, list) and len(list_data) >= 1:
+                list_name = list_data[0]
+                self._list_id_cache[list_name] = list_id
     
     def update_lists(self, list_updates: dict[str, list]) -> bool:
         """
         Update multiple lists in the project.
+        Lists whose contents match what was last uploaded are skipped; if
+        nothing changed, no request is made at all.
         
         Args:
             list_updates: Dict mapping list names to their new contents.
                          e.g., {"GRID": [...], "USERS:X": [...]}
         
         Returns:
-            True if successful, False otherwise.
+            True if successful (or nothing to do), False otherwise.
         """
-        project_json = self.get_project_json()
+        new_hashes = {name: list_digest(contents) for name, contents in list_updates.items()}
+        changed = [name for name in list_updates if self._list_hashes.get(name) != new_hashes[name]]
+        if not changed:
+            return True
+        
+        project_json = self._current_project_json()
         if not project_json:
             return False
         
-        # Build cache if needed
-        if not self._list_id_cache:
-            self._build_list_id_cache(project_json)
+        # A fresh download may show some lists already up to date
+        changed = [name for name in list_updates if self._list_hashes.get(name) != new_hashes[name]]
+        if not changed:
+            return True
         
-        # Find stage target and update lists
-        for target in project_json.get("targets", []):
-            if target.get("isStage", False):
-                lists = target.get("lists", {})
-                
-                for list_name, new_contents in list_updates.items():
-                    list_id = self._list_id_cache.get(list_name)
-                    if list_id and list_id in lists:
-                        # lists[list_id] = [name, [values...]]
-                        lists[list_id][1] = new_contents
-                    else:
-                        print(f"Warning: List '{list_name}' not found in project")
-                
-                break
+        # Update changed lists on the stage target
+        lists = self._stage_lists(project_json)
+        for list_name in changed:
+            list_id = self._list_id_cache.get(list_name)
+            if list_id and list_id in lists:
+                # lists[list_id] = [name, [values...]]
+                lists[list_id][1] = list_updates[list_name]
+            else:
+                print(f"Warning: List '{list_name}' not found in project")
         
         # Upload modified JSON
         self._wait_for_rate_limit()
         try:
-            self.project.set_json(project_json)
-            return True
+            with metrics.timer("api.set_json"):
+                self.project.set_json(project_json)
         except Exception as e:
             print(f"Error uploading project JSON: {e}")
+            self._record_error(e)
+            # The server copy is now unknown; re-download before the next upload
+            self.mark_stale()
             return False
+        
+        metrics.count("lists_uploaded", len(changed))
+        for name in changed:
+            self._list_hashes[name] = new_hashes[name]
+        self._save_sync_state(project_json)
+        print(f"Uploaded {len(changed)} changed list(s): {', '.join(changed)}")
+        return True
+    
+    def _save_sync_state(self, project_json: dict):
+        """Persist list hashes, the download time and the project JSON for the next run."""
+        try:
+            atomic_write_json(self.sync_state_path, {
+                "list_hashes": self._list_hashes,
+                "downloaded_at": self._project_json_time
+            })
+            cache_dir = os.path.dirname(self.project_cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            atomic_write_json(self.project_cache_path, project_json)
+        except OSError as e:
+            print(f"Error saving sync cache: {e}")
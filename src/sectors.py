@@ -0,0 +1,365 @@
+"""
+Sector regeneration.
+
+The world is divided into sector_size x sector_size sectors. Each day
+sectors_regen_per_day of them are scheduled for regeneration, announced
+regen_warning_hours ahead. Regenerating a sector re-carves only its own
+tiles the way the world generator does: mazes carved from the border
+openings (as the world carves from the hub edge), the rest of the odd
+lattice filled in, then loops and ores, so the open density matches a
+fresh world. Every border tile that opened onto a walkable neighbouring
+tile stays open, and all floor inside the sector is joined into one
+region, so the sector stays connected to its neighbors. Sectors that
+overlap the hub are never regenerated.
+
+Schedule state lives in world_state["sectors"]:
+    next_schedule_at  unix time the next sector gets picked
+    pending           [{"sector": [sx, sy], "warn_at": t, "regen_at": t}]
+    last_regen        {"sx,sy": unix time}
+"""
+
+import random
+import time
+from typing import Optional
+
+from src.config import get_config
+from src.grid import Grid
+from src.pathfinding import eject_from_rect
+from src.world_gen import distance_from_hub, get_complexity, get_sector_bounds
+
+class SectorChange:
+    """Result of regenerating one sector."""
+    
+    def __init__(self, sector: tuple[int, int], rect: tuple[int, int, int, int], changed: list[int]):
+        self.sector = sector
+        self.rect = rect          # (min_x, min_y, max_x, max_y), inclusive
+        self.changed = changed    # Flat indexes whose tile changed
+        self.moved_players: list[str] = []
+        self.moved_creatures: list[int] = []
+    
+    def __repr__(self) -> str:
+        return f"SectorChange(sector={self.sector}, rect={self.rect}, tiles={len(self.changed)})"
+
+def sector_overlaps_hub(rect: tuple[int, int, int, int], settings: dict) -> bool:
+    min_x, min_y, max_x, max_y = rect
+    hx, hy = settings["hub_center"]
+    r = settings["hub_radius"]
+    return not (max_x < hx - r or min_x > hx + r or max_y < hy - r or min_y > hy + r)
+
+def _odd_at_or_after(v: int) -> int:
+    return v if v % 2 else v + 1
+
+def _join_regions(new: bytearray, w: int, h: int, floor_tile: int, seeds: list[int]):
+    """
+    Carve the shortest wall runs that join every floor region of a
+    w x h tile block into one, starting from the region of seeds[0] (or
+    the first floor tile).
+    """
+    main = bytearray(w * h)
+    
+    def grow(frontier: list[int]):
+        # Flood the floor region(s) touching `frontier` into `main`
+        while frontier:
+            i = frontier.pop()
+            x = i % w
+            for j, ok in ((i - w, i >= w), (i + w, i + w < w * h), (i - 1, x > 0), (i + 1, x + 1 < w)):
+                if ok and not main[j] and new[j] == floor_tile:
+                    main[j] = 1
+                    frontier.append(j)
+    
+    first = seeds[0] if seeds else next((i for i, t in enumerate(new) if t == floor_tile), None)
+    if first is None:
+        return
+    main[first] = 1
+    grow([first])
+    
+    while True:
+        # BFS out of the joined region until another floor region is hit
+        came_from = {i: -1 for i in range(w * h) if main[i]}
+        queue = list(came_from)
+        hit = -1
+        for i in queue:
+            x = i % w
+            for j, ok in ((i - w, i >= w), (i + w, i + w < w * h), (i - 1, x > 0), (i + 1, x + 1 < w)):
+                if ok and j not in came_from:
+                    came_from[j] = i
+                    if new[j] == floor_tile:
+                        hit = j
+                        break
+                    queue.append(j)
+            if hit != -1:
+                break
+        if hit == -1:
+            return
+        path = [hit]
+        i = came_from[hit]
+        while not main[i]:
+            new[i] = floor_tile
+            path.append(i)
+            i = came_from[i]
+        for i in path:
+            main[i] = 1
+        grow(path)
+
+def carve_sector(grid: Grid, rect: tuple[int, int, int, int], rng: random.Random) -> bytearray:
+    """
+    Build new tiles for `rect` without touching the grid. Returns the
+    rect's tiles row by row (width * height bytes).
+    """
+    config = get_config()
+    settings = config.settings
+    tiles = grid.tiles
+    floor_tile = tiles.primary_floor
+    wall_tile = tiles.primary_wall
+    size = grid.size
+    cells = grid.cells
+    walkable = tiles.walkable
+    hub_center = tuple(settings["hub_center"])
+    
+    min_x, min_y, max_x, max_y = rect
+    w = max_x - min_x + 1
+    h = max_y - min_y + 1
+    new = bytearray([wall_tile]) * (w * h)
+    
+    def local(x: int, y: int) -> int:
+        return (y - min_y) * w + (x - min_x)
+    
+    # Border openings: border tiles next to walkable ground outside the rect
+    openings = []
+    for y in range(min_y, max_y + 1):
+        for x in range(min_x, max_x + 1):
+            if min_x < x < max_x and min_y < y < max_y:
+                continue
+            for ox, oy in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if min_x <= ox <= max_x and min_y <= oy <= max_y:
+                    continue
+                if 0 <= ox < size and 0 <= oy < size and walkable[cells[oy * size + ox]]:
+                    openings.append((x, y))
+                    break
+    
+    visited = bytearray(w * h)
+    
+    def carve_maze(start: tuple[int, int]):
+        """Recursive backtracker inside the rect, as in world generation."""
+        stack = [start]
+        visited[local(*start)] = 1
+        new[local(*start)] = floor_tile
+        while stack:
+            x, y = stack[-1]
+            neighbors = []
+            for dx, dy in ((0, -2), (0, 2), (-2, 0), (2, 0)):
+                nx, ny = x + dx, y + dy
+                if min_x <= nx <= max_x and min_y <= ny <= max_y and not visited[local(nx, ny)]:
+                    neighbors.append((nx, ny, x + dx // 2, y + dy // 2))
+            if neighbors:
+                nx, ny, wx, wy = rng.choice(neighbors)
+                new[local(wx, wy)] = floor_tile
+                visited[local(wx, wy)] = 1
+                new[local(nx, ny)] = floor_tile
+                visited[local(nx, ny)] = 1
+                stack.append((nx, ny))
+            else:
+                stack.pop()
+    
+    # Carve from the openings the way the world carves from the hub edge,
+    # then fill what is left on the odd lattice. Mazes started on
+    # different lattices interleave, which gives the world its open
+    # density instead of single-width corridors.
+    rng.shuffle(openings)
+    for start in openings:
+        if not visited[local(*start)]:
+            carve_maze(start)
+    for y in range(_odd_at_or_after(min_y), max_y + 1, 2):
+        for x in range(_odd_at_or_after(min_x), max_x + 1, 2):
+            if not visited[local(x, y)]:
+                carve_maze((x, y))
+    
+    _join_regions(new, w, h, floor_tile, [local(x, y) for x, y in openings])
+    
+    # Loops (more near the hub) and ores, as in world generation
+    max_dist = size * 0.7
+    for y in range(max(min_y, 1), min(max_y, size - 2) + 1):
+        for x in range(max(min_x, 1), min(max_x, size - 2) + 1):
+            i = local(x, y)
+            if new[i] != wall_tile:
+                continue
+            floor_neighbors = 0
+            for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                if min_x <= nx <= max_x and min_y <= ny <= max_y:
+                    floor_neighbors += new[local(nx, ny)] == floor_tile
+                else:
+                    floor_neighbors += cells[ny * size + nx] == floor_tile
+            if floor_neighbors >= 2:
+                complexity = get_complexity(distance_from_hub(x, y, hub_center), max_dist)
+                if rng.random() < 0.15 * (1 - complexity):
+                    new[i] = floor_tile
+    
+    for y in range(min_y, max_y + 1):
+        for x in range(min_x, max_x + 1):
+            i = local(x, y)
+            if new[i] == floor_tile and rng.random() < 0.03:
+                valid_ores = config.ore_ids_at_distance(distance_from_hub(x, y, hub_center))
+                if valid_ores:
+                    new[i] = rng.choice(valid_ores)
+    
+    return new
+
+def regenerate_sector(
+    world_state: dict,
+    sx: int,
+    sy: int,
+    players: Optional[dict] = None,
+    creatures=None,
+    seed: Optional[int] = None
+) -> SectorChange:
+    """
+    Regenerate one sector in place and move anyone inside it to the
+    nearest tile outside that is connected to the hub (one batched BFS). Scouting of the
+    sector is forgotten. Only changed tiles are written to the grid, so
+    dirty tracking and distance/region caches see just this sector.
+    Raises ValueError for a sector that overlaps the hub.
+    """
+    grid: Grid = world_state["grid"]
+    settings = get_config().settings
+    sector_size = settings["sector_size"]
+    size = grid.size
+    min_x, min_y, max_x, max_y = get_sector_bounds(sx, sy, sector_size)
+    max_x, max_y = min(max_x, size - 1), min(max_y, size - 1)
+    rect = (min_x, min_y, max_x, max_y)
+    if sector_overlaps_hub(rect, settings):
+        raise ValueError(f"Sector ({sx}, {sy}) overlaps the hub and is never regenerated")
+    w = max_x - min_x + 1
+    
+    # Move everyone out first: tiles outside the sector keep their
+    # connectivity, so exits found now stay valid after re-carving
+    hub = tuple(settings["hub_center"])
+    evicted_players = [
+        (username, player) for username, player in (players or {}).items()
+        if min_x <= player["x"] <= max_x and min_y <= player["y"] <= max_y
+    ]
+    evicted_creatures = creatures.in_rect(*rect) if creatures is not None else []
+    exits = eject_from_rect(
+        grid, rect,
+        [(p["x"], p["y"]) for _, p in evicted_players] + [(c["x"], c["y"]) for c in evicted_creatures],
+        reachable_from=hub
+    )
+    player_exits = exits[:len(evicted_players)]
+    creature_exits = exits[len(evicted_players):]
+    
+    new = carve_sector(grid, rect, random.Random(seed))
+    changed = []
+    for y in range(min_y, max_y + 1):
+        row = (y - min_y) * w
+        for x in range(min_x, max_x + 1):
+            tile = new[row + x - min_x]
+            if grid.cells[y * size + x] != tile:
+                grid.set(x, y, tile)
+                changed.append(y * size + x)
+    
+    change = SectorChange((sx, sy), rect, changed)
+    
+    for (username, player), pos in zip(evicted_players, player_exits):
+        player["x"], player["y"] = pos or hub
+        change.moved_players.append(username)
+    for creature, pos in zip(evicted_creatures, creature_exits):
+        if pos is None:
+            creatures.remove(creature["id"])
+        else:
+            creatures.move(creature, *pos)
+        change.moved_creatures.append(creature["id"])
+    
+    scouted = world_state.get("scouted")
+    if scouted is not None:
+        scouted.forget(
+            y * size + x for y in range(min_y, max_y + 1) for x in range(min_x, max_x + 1)
+        )
+    
+    return change
+
+def _sector_key(sector) -> str:
+    return f"{sector[0]},{sector[1]}"
+
+def _pick_sector(meta: dict, settings: dict, rng: random.Random) -> Optional[tuple[int, int]]:
+    """Least recently regenerated sector that is not hub or already pending."""
+    per_axis = settings["sectors_per_axis"]
+    sector_size = settings["sector_size"]
+    pending = {_sector_key(p["sector"]) for p in meta["pending"]}
+    candidates = []
+    for sy in range(per_axis):
+        for sx in range(per_axis):
+            key = _sector_key((sx, sy))
+            if key in pending or sector_overlaps_hub(get_sector_bounds(sx, sy, sector_size), settings):
+                continue
+            candidates.append((meta["last_regen"].get(key, 0), rng.random(), (sx, sy)))
+    if not candidates:
+        return None
+    return min(candidates)[2]
+
+def sector_meta(world_state: dict) -> dict:
+    meta = world_state.setdefault("sectors", {})
+    meta.setdefault("pending", [])
+    meta.setdefault("last_regen", {})
+    return meta
+
+def pending_warning(world_state: dict, x: int, y: int, now: Optional[float] = None) -> Optional[float]:
+    """Seconds until the sector containing (x, y) regenerates, if it is announced."""
+    if now is None:
+        now = time.time()
+    sector_size = get_config().settings["sector_size"]
+    sector = [x // sector_size, y // sector_size]
+    for p in world_state.get("sectors", {}).get("pending", []):
+        if p["sector"] == sector and p["warn_at"] <= now:
+            return max(0.0, p["regen_at"] - now)
+    return None
+
+def tick_sector_regen(
+    world_state: dict,
+    players: dict,
+    creatures,
+    now: Optional[float] = None,
+    rng: Optional[random.Random] = None
+) -> list[SectorChange]:
+    """
+    Schedule sectors (sectors_regen_per_day, each announced
+    regen_warning_hours ahead) and regenerate those that are due.
+    Returns the changes made this tick.
+    """
+    if now is None:
+        now = time.time()
+    if rng is None:
+        rng = random.Random()
+    settings = get_config().settings
+    meta = sector_meta(world_state)
+    per_day = settings.get("sectors_regen_per_day", 0)
+    warning = settings.get("regen_warning_hours", 24) * 3600
+    
+    if per_day > 0:
+        interval = 86400 / per_day
+        if "next_schedule_at" not in meta:
+            meta["next_schedule_at"] = now
+        # Catch up at most one day of missed slots
+        meta["next_schedule_at"] = max(meta["next_schedule_at"], now - 86400)
+        while meta["next_schedule_at"] <= now:
+            sector = _pick_sector(meta, settings, rng)
+            if sector is None:
+                meta["next_schedule_at"] = now + interval
+                break
+            regen_at = max(now, meta["next_schedule_at"]) + warning
+            meta["pending"].append({"sector": list(sector), "warn_at": now, "regen_at": regen_at})
+            meta["next_schedule_at"] += interval
+    
+    changes = []
+    still_pending = []
+    for p in meta["pending"]:
+        if p["regen_at"] > now:
+            still_pending.append(p)
+            continue
+        sx, sy = p["sector"]
+        if sector_overlaps_hub(get_sector_bounds(sx, sy, settings["sector_size"]), settings):
+            # Scheduled before the hub moved or grew; drop it
+            print(f"Skipping regen of sector ({sx}, {sy}): it overlaps the hub")
+            continue
+        changes.append(regenerate_sector(world_state, sx, sy, players, creatures, seed=rng.getrandbits(64)))
+        meta["last_regen"][_sector_key(p["sector"])] = now
+    meta["pending"] = still_pending
+    return changes
@@ -0,0 +1,228 @@
+"""
+Creature spawning.
+
+Each walkable tile outside the hub belongs to a zone: the tier ring from
+config/tiers.json that its hub distance falls in. SpawnTables keeps a
+list of eligible tiles per zone (kept in sync as tiles open and close),
+so a spawn point is one weighted zone pick plus one uniform list pick,
+whatever the wall density or population.
+
+Population is capped overall (max_creatures), per zone (zone_creature_caps,
+or a share of max_creatures proportional to the zone's size) and per
+sector (max_creatures_per_sector). A killed creature holds its zone and
+sector slot for creature_respawn_minutes before it can be replaced.
+"""
+
+import math
+import random
+import time
+from array import array
+from typing import Optional
+
+from src.config import Config, get_config
+from src.creatures import CreatureStore
+from src.grid import Grid
+
+SECTOR_RETRIES = 4  # Tile picks per spawn before giving up on full sectors
+
+class SpawnTables:
+    def __init__(self, grid: Grid, config: Config):
+        self.grid = grid
+        self.config = config
+        settings = config.settings
+        size = grid.size
+        hub_x, hub_y = settings["hub_center"]
+        hub_radius = settings["hub_radius"]
+        self.sector_size = settings["sector_size"]
+        
+        # zone[i] = tier of tile i, 0 inside the hub
+        self.zone = bytearray(size * size)
+        self.tiles: dict[int, array] = {tier: array("i") for tier in range(1, config.max_tier + 1)}
+        self._slot = array("i", [-1]) * (size * size)  # position of a tile in its zone list
+        walkable = grid.tiles.walkable
+        cells = grid.cells
+        for y in range(size):
+            for x in range(size):
+                if abs(x - hub_x) <= hub_radius and abs(y - hub_y) <= hub_radius:
+                    continue
+                i = y * size + x
+                self.zone[i] = config.tier_for_distance(math.hypot(x - hub_x, y - hub_y))
+                if walkable[cells[i]]:
+                    self._add_tile(i)
+        
+        self.counted: Optional[CreatureStore] = None
+        grid.walkability_listeners.append(self._on_walkability_change)
+    
+    def _add_tile(self, i: int):
+        tiles = self.tiles[self.zone[i]]
+        self._slot[i] = len(tiles)
+        tiles.append(i)
+    
+    def _remove_tile(self, i: int):
+        tiles = self.tiles[self.zone[i]]
+        slot = self._slot[i]
+        last = tiles.pop()
+        if last != i:
+            tiles[slot] = last
+            self._slot[last] = slot
+        self._slot[i] = -1
+    
+    def _on_walkability_change(self, i: int, now_walkable: bool):
+        if not self.zone[i]:
+            return
+        if now_walkable and self._slot[i] == -1:
+            self._add_tile(i)
+        elif not now_walkable and self._slot[i] != -1:
+            self._remove_tile(i)
+    
+    def zone_at(self, x: int, y: int) -> int:
+        return self.zone[y * self.grid.size + x]
+    
+    def sector_at(self, x: int, y: int) -> tuple[int, int]:
+        return (x // self.sector_size, y // self.sector_size)
+    
+    def zone_caps(self) -> dict[int, int]:
+        """Population cap per zone, from settings or proportional to zone size."""
+        settings = self.config.settings
+        caps = settings.get("zone_creature_caps")
+        if caps:
+            return {tier: caps.get(str(tier), 0) for tier in self.tiles}
+        max_creatures = settings.get("max_creatures", 100)
+        total = sum(len(tiles) for tiles in self.tiles.values()) or 1
+        return {tier: math.ceil(max_creatures * len(tiles) / total) for tier, tiles in self.tiles.items()}
+    
+    def track(self, creatures: CreatureStore):
+        """Make `creatures` keep live per-zone and per-sector counts for these tables."""
+        if self.counted is creatures:
+            return
+        creatures.add_counter("zone", self.zone_at)
+        creatures.add_counter("sector", self.sector_at)
+        self.counted = creatures
+
+def get_spawn_tables(grid: Grid) -> SpawnTables:
+    """The grid's spawn tables, rebuilt if the config changed."""
+    config = get_config()
+    tables = grid.indexes.get("spawn")
+    if tables is None or tables.config is not config:
+        if tables is not None:
+            grid.walkability_listeners.remove(tables._on_walkability_change)
+        tables = SpawnTables(grid, config)
+        grid.indexes["spawn"] = tables
+    return tables
+
+def record_death(
+    creatures: CreatureStore,
+    grid: Grid,
+    creature: dict,
+    now: Optional[float] = None,
+    store=None
+):
+    """
+    Hold a killed creature's zone and sector slot for creature_respawn_minutes.
+    The respawn timer is saved with the entities, so `store` (a StateStore)
+    is marked dirty.
+    """
+    if now is None:
+        now = time.time()
+    tables = get_spawn_tables(grid)
+    x, y = creature["x"], creature["y"]
+    creatures.entities.setdefault("respawns", []).append({
+        "due": now + tables.config.settings.get("creature_respawn_minutes", 60) * 60,
+        "zone": tables.zone_at(x, y),
+        "sector": list(tables.sector_at(x, y))
+    })
+    if store is not None:
+        store.mark_entities()
+
+def _pending_respawns(entities: dict, now: float) -> tuple[dict, dict, bool]:
+    """
+    Drop expired respawn timers. Returns pending counts per zone and per
+    sector, and whether any timer was dropped.
+    """
+    respawns = [r for r in entities.get("respawns", []) if r["due"] > now]
+    expired = len(respawns) != len(entities.get("respawns", ()))
+    if expired:
+        entities["respawns"] = respawns
+    by_zone: dict[int, int] = {}
+    by_sector: dict[tuple[int, int], int] = {}
+    for r in respawns:
+        by_zone[r["zone"]] = by_zone.get(r["zone"], 0) + 1
+        sector = tuple(r["sector"])
+        by_sector[sector] = by_sector.get(sector, 0) + 1
+    return by_zone, by_sector, expired
+
+def spawn_creatures(
+    creatures: CreatureStore,
+    grid: Grid,
+    world_state: dict,
+    count: int = 5,
+    now: Optional[float] = None,
+    store=None
+) -> int:
+    """
+    Spawn up to `count` creatures where caps allow. Returns the number
+    spawned. If creatures spawned or respawn timers expired, `store` (a
+    StateStore) is marked dirty.
+    """
+    if now is None:
+        now = time.time()
+    config = get_config()
+    settings = config.settings
+    tables = get_spawn_tables(grid)
+    tables.track(creatures)
+    
+    pending_zone, pending_sector, expired = _pending_respawns(creatures.entities, now)
+    max_creatures = settings.get("max_creatures", 100)
+    sector_cap = settings.get("max_creatures_per_sector", 4)
+    zone_caps = tables.zone_caps()
+    
+    spawned = 0
+    skipped = set()  # Zones with full sectors or no creature types; left for next tick
+    while spawned < count and len(creatures) + sum(pending_zone.values()) < max_creatures:
+        # Zones with room, weighted by how many tiles they have
+        open_zones = [
+            (tier, tiles) for tier, tiles in tables.tiles.items()
+            if tiles and tier not in skipped
+            and creatures.population("zone", tier) + pending_zone.get(tier, 0) < zone_caps[tier]
+        ]
+        if not open_zones:
+            break
+        pick = random.randrange(sum(len(tiles) for _, tiles in open_zones))
+        for tier, tiles in open_zones:
+            if pick < len(tiles):
+                break
+            pick -= len(tiles)
+        
+        size = grid.size
+        for _ in range(SECTOR_RETRIES):
+            i = tiles[random.randrange(len(tiles))]
+            x, y = i % size, i // size
+            sector = tables.sector_at(x, y)
+            if creatures.population("sector", sector) + pending_sector.get(sector, 0) < sector_cap:
+                break
+        else:
+            skipped.add(tier)  # Sectors in this zone look full; try the others
+            continue
+        
+        valid_types = config.creature_types_by_tier.get(tier, ())
+        if not valid_types:
+            skipped.add(tier)
+            continue
+        chosen_type = random.choice(valid_types)
+        cdata = config.creature_types[chosen_type]
+        
+        creatures.add({
+            "type": int(chosen_type),
+            "type_name": cdata["name"],
+            "x": x,
+            "y": y,
+            "hp": cdata["hp"],
+            "max_hp": cdata["hp"],
+            "tier": cdata["tier"],
+            "chasing": None
+        })
+        spawned += 1
+    
+    if store is not None and (spawned or expired):
+        store.mark_entities()
+    return spawned
@@ -1,125 +1,37 @@
 """
-World tick processing: creature respawns, cooldown decrements, sector regen.
+World tick processing: creature respawns and sector regen.
+
+Player energy and harvest cooldowns are not ticked; they are caught up
+lazily when a player is accessed (see src/timers.py).
 """
 
-import json
-import random
 from datetime import datetime, timedelta
 
-def load_settings() -> dict:
-    with open("config/settings.json", "r") as f:
-        return json.load(f)
-
-def load_creatures_config() -> dict:
-    with open("config/creatures.json", "r") as f:
-        return json.load(f)
-
-def tick_cooldowns(players: dict):
-    """Decrement all player cooldowns by 1 minute."""
-    for username, player in players.items():
-        if "cooldowns" not in player:
-            continue
-        
-        for key in list(player["cooldowns"].keys()):
-            player["cooldowns"][key] -= 1
-            if player["cooldowns"][key] <= 0:
-                del player["cooldowns"][key]
-
-def tick_energy_regen(players: dict, amount: int = 2):
-    """Regenerate player energy each tick."""
-    for username, player in players.items():
-        if player.get("dead"):
-            continue
-        player["energy"] = min(player["max_energy"], player["energy"] + amount)
-
-def spawn_creatures(entities: dict, grid: list[list[int]], world_state: dict, count: int = 5):
-    """Spawn new creatures if below threshold."""
-    settings = load_settings()
-    creatures_config = load_creatures_config()
-    
-    current_count = len(entities.get("creatures", []))
-    max_creatures = 100  # Configurable
-    
-    if current_count >= max_creatures:
-        return
-    
-    size = settings["world_size"]
-    hub = settings["hub_center"]
-    hub_radius = settings["hub_radius"]
-    
-    tiles_config_path = "config/tiles.json"
-    with open(tiles_config_path, "r") as f:
-        tiles = json.load(f)
-    
-    spawned = 0
-    attempts = 0
-    max_attempts = count * 10
-    
-    while spawned < count and attempts < max_attempts:
-        attempts += 1
-        
-        x = random.randint(0, size - 1)
-        y = random.randint(0, size - 1)
-        
-        # Not in hub
-        if abs(x - hub[0]) <= hub_radius and abs(y - hub[1]) <= hub_radius:
-            continue
-        
-        # Must be walkable
-        tile = grid[y][x]
-        if tile in tiles["wall"]:
-            continue
-        
-        # Determine creature type based on distance
-        dist = ((x - hub[0])**2 + (y - hub[1])**2) ** 0.5
-        
-        # Pick appropriate tier creature
-        tier = 1
-        if dist > 120:
-            tier = 5
-        elif dist > 80:
-            tier = 4
-        elif dist > 50:
-            tier = 3
-        elif dist > 25:
-            tier = 2
-        
-        # Find creatures of appropriate tier
-        valid_types = []
-        for ctype, cdata in creatures_config["types"].items():
-            if cdata["tier"] <= tier:
-                valid_types.append(ctype)
-        
-        if not valid_types:
-            continue
-        
-        chosen_type = random.choice(valid_types)
-        cdata = creatures_config["types"][chosen_type]
-        
-        creature = {
-            "id": entities.get("next_id", 1),
-            "type": int(chosen_type),
-            "type_name": cdata["name"],
-            "x": x,
-            "y": y,
-            "hp": cdata["hp"],
-            "max_hp": cdata["hp"],
-            "tier": cdata["tier"],
-            "chasing": None
-        }
-        
-        if "creatures" not in entities:
-            entities["creatures"] = []
-        
-        entities["creatures"].append(creature)
-        entities["next_id"] = entities.get("next_id", 1) + 1
-        spawned += 1
+from src.grid import Grid
+from src.persistence import StateStore
+from src.sectors import tick_sector_regen
+from src.spawning import spawn_creatures
 
-def process_tick(world_state: dict, grid: list[list[int]], players: dict, entities: dict):
+def process_tick(world_state: dict, grid: Grid, players: dict, entities: dict, store: StateStore):
     """Process one minute tick of the game world."""
-    tick_cooldowns(players)
-    tick_energy_regen(players)
-    spawn_creatures(entities, grid, world_state, count=3)
+    spawn_creatures(store.creatures, grid, world_state, count=3, store=store)
+    
+    # Scheduling and regen dirty metadata sections, so the next checkpoint
+    # rewrites all of world.bin rather than patching tiles in place. This
+    # happens about 2 * sectors_regen_per_day times a day, and the file is
+    # small next to the GRID list that every sync uploads in full anyway.
+    meta_before = world_state.get("sectors", {})
+    schedule_before = meta_before.get("next_schedule_at")
+    pending_before = len(meta_before.get("pending", []))
+    changes = tick_sector_regen(world_state, players, store.creatures)
+    meta = world_state["sectors"]
+    if changes or meta.get("next_schedule_at") != schedule_before or len(meta["pending"]) != pending_before:
+        store.mark_world("sectors")
+    for change in changes:
+        print(f"Regenerated sector {change.sector}: {len(change.changed)} tiles in {change.rect}")
+        store.mark_world("scouted")
+        store.mark_players(change.moved_players)
+        if change.moved_creatures:
+            store.mark_entities()
     
-    # TODO: Sector regeneration checks
     # TODO: Calamity progression
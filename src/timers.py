@@ -0,0 +1,82 @@
+"""
+Lazy player timers.
+
+Harvest cooldowns are stored as absolute expiry times (unix seconds) and
+energy as a value plus the time it was last brought up to date
+("energy_at"). Nothing is touched per tick: sync_player() catches a
+player up in closed form whenever they are accessed, so minutes the bot
+was not running are still counted, and idle players cost nothing.
+"""
+
+import math
+import time
+from typing import Optional
+
+from src.config import get_config
+
+# Cooldown values below this are legacy "minutes remaining" counters
+LEGACY_COOLDOWN_LIMIT = 10**9
+
+def energy_rate() -> int:
+    """Energy regained per full minute."""
+    return get_config().settings.get("energy_regen_per_minute", 2)
+
+def sync_energy(player: dict, now: float) -> bool:
+    """
+    Add the energy earned since energy_at, keeping any partial minute.
+    Dead and full players earn nothing. Returns True if the player changed.
+    """
+    last = player.get("energy_at")
+    if last is None:
+        player["energy_at"] = now
+        return True
+    minutes = int((now - last) // 60)
+    if minutes <= 0:
+        return False
+    if player.get("dead") or player["energy"] >= player["max_energy"]:
+        player["energy_at"] = now
+        return True
+    energy = player["energy"] + minutes * energy_rate()
+    if energy >= player["max_energy"]:
+        player["energy"] = player["max_energy"]
+        player["energy_at"] = now
+    else:
+        player["energy"] = energy
+        player["energy_at"] = last + minutes * 60
+    return True
+
+def sync_cooldowns(player: dict, now: float) -> bool:
+    """Drop expired cooldowns, converting legacy minute counters first."""
+    cooldowns = player.get("cooldowns")
+    if not cooldowns:
+        return False
+    changed = False
+    for key, value in list(cooldowns.items()):
+        if value < LEGACY_COOLDOWN_LIMIT:
+            value = cooldowns[key] = int(now) + value * 60
+            changed = True
+        if value <= now:
+            del cooldowns[key]
+            changed = True
+    return changed
+
+def sync_player(player: dict, now: Optional[float] = None) -> bool:
+    """Bring a player's energy and cooldowns up to `now`. Returns True if anything changed."""
+    if now is None:
+        now = time.time()
+    energy_changed = sync_energy(player, now)
+    return sync_cooldowns(player, now) or energy_changed
+
+def start_cooldown(player: dict, key: str, minutes: int, now: Optional[float] = None):
+    if now is None:
+        now = time.time()
+    player.setdefault("cooldowns", {})[key] = int(now) + minutes * 60
+
+def cooldown_remaining(player: dict, key: str, now: Optional[float] = None) -> int:
+    """Whole minutes left on a cooldown (rounded up), 0 if not active."""
+    if now is None:
+        now = time.time()
+    expires = player.get("cooldowns", {}).get(key)
+    if expires is None or expires <= now:
+        return 0
+    return math.ceil((expires - now) / 60)
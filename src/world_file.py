@@ -0,0 +1,134 @@
+"""
+Binary world file format (state/world.bin).
+
+Layout (all integers little-endian):
+    header    32 bytes: magic, version, header size, world size,
+              tile layer offset, metadata offset, section count
+    tiles     world_size * world_size bytes, one costume number per tile,
+              row-major (index = y * size + x)
+    metadata  section_count entries of:
+              name length (u16), codec (u8), payload length (u32),
+              name (utf-8), payload
+
+The tile layer sits at a fixed offset so single-tile changes can be
+patched in place through mmap without touching the rest of the file.
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Iterable, Optional
+
+from src.fileio import atomic_write_bytes
+from src.grid import Grid
+
+MAGIC = b"CAVW"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIII4x")
+SECTION_HEADER = struct.Struct("<HBI")
+
+CODEC_JSON = 0
+CODEC_RAW = 1
+
+class WorldFileError(Exception):
+    """Raised when a world file is truncated, corrupt or of an unknown version."""
+
+def encode_sections(sections: dict) -> bytes:
+    """Encode metadata sections. bytes values are stored raw, everything else as JSON."""
+    out = bytearray()
+    for name, value in sections.items():
+        if isinstance(value, (bytes, bytearray)):
+            codec = CODEC_RAW
+            payload = bytes(value)
+        else:
+            codec = CODEC_JSON
+            payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        name_bytes = name.encode("utf-8")
+        out += SECTION_HEADER.pack(len(name_bytes), codec, len(payload))
+        out += name_bytes
+        out += payload
+    return bytes(out)
+
+def decode_sections(data, offset: int, count: int) -> dict:
+    """Decode `count` metadata sections starting at `offset`."""
+    sections = {}
+    for _ in range(count):
+        name_len, codec, payload_len = SECTION_HEADER.unpack_from(data, offset)
+        offset += SECTION_HEADER.size
+        name = bytes(data[offset:offset + name_len]).decode("utf-8")
+        offset += name_len
+        payload = bytes(data[offset:offset + payload_len])
+        offset += payload_len
+        if len(payload) != payload_len:
+            raise WorldFileError(f"Section '{name}' is truncated")
+        if codec == CODEC_RAW:
+            sections[name] = payload
+        else:
+            sections[name] = json.loads(payload)
+    return sections
+
+def _pack_header(size: int, section_count: int) -> bytes:
+    tile_offset = HEADER.size
+    meta_offset = tile_offset + size * size
+    return HEADER.pack(MAGIC, VERSION, HEADER.size, size, tile_offset, meta_offset, section_count)
+
+def _unpack_header(data) -> tuple[int, int, int, int]:
+    """Validate the header. Returns (size, tile_offset, meta_offset, section_count)."""
+    if len(data) < HEADER.size:
+        raise WorldFileError("World file is truncated")
+    magic, version, header_size, size, tile_offset, meta_offset, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise WorldFileError("Not a world file")
+    if version != VERSION:
+        raise WorldFileError(f"Unsupported world file version {version}")
+    if meta_offset != tile_offset + size * size or len(data) < meta_offset:
+        raise WorldFileError("World file tile layer is truncated")
+    return size, tile_offset, meta_offset, count
+
+def write_world_file(filepath: str, grid: Grid, sections: dict):
+    """Write a complete world file atomically (temp file + rename)."""
+    data = _pack_header(grid.size, len(sections)) + bytes(grid.cells) + encode_sections(sections)
+    atomic_write_bytes(filepath, data)
+
+def read_world_file(filepath: str) -> tuple[Grid, dict]:
+    """Read a world file through mmap. Returns (grid, metadata sections)."""
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise WorldFileError("World file is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size, tile_offset, meta_offset, count = _unpack_header(mm)
+            cells = bytearray(mm[tile_offset:meta_offset])
+            sections = decode_sections(mm, meta_offset, count)
+    grid = Grid(size, cells=cells)
+    grid.mark_clean()
+    return grid, sections
+
+def read_world_size(filepath: str) -> Optional[int]:
+    """World size stored in an existing file's header, or None if unreadable."""
+    try:
+        with open(filepath, "rb") as f:
+            return _read_size(f)
+    except (FileNotFoundError, WorldFileError):
+        return None
+
+def _read_size(f) -> int:
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise WorldFileError("World file is truncated")
+    magic, version, _, size, _, _, _ = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise WorldFileError("Not a compatible world file")
+    return size
+
+def write_tiles(filepath: str, grid: Grid, indices: Iterable[int]):
+    """Patch individual tiles of an existing world file in place."""
+    with open(filepath, "r+b") as f:
+        with mmap.mmap(f.fileno(), 0) as mm:
+            size, tile_offset, _, _ = _unpack_header(mm)
+            if size != grid.size:
+                raise WorldFileError(f"World file is {size}x{size}, grid is {grid.size}x{grid.size}")
+            cells = grid.cells
+            for i in indices:
+                mm[tile_offset + i] = cells[i]
+            mm.flush()
@@ -4,16 +4,13 @@ World generation: 200x200 maze with varying complexity by distance from hub.
 
 import random
 import json
-from collections import deque
+from array import array
 from typing import Optional
 
-def load_tile_config() -> dict:
-    with open("config/tiles.json", "r") as f:
-        return json.load(f)
-
-def load_settings() -> dict:
-    with open("config/settings.json", "r") as f:
-        return json.load(f)
+from src.config import get_config
+from src.grid import Grid
+from src.scouted import ScoutedMap, load_scouted
+from src.world_file import read_world_file, read_world_size, write_tiles, write_world_file
 
 def distance_from_hub(x: int, y: int, hub_center: tuple[int, int]) -> float:
     """Euclidean distance from hub center."""
@@ -25,173 +22,166 @@ def get_complexity(dist: float, max_dist: float) -> float:
     """
     return min(1.0, dist / max_dist)
 
-def generate_world(seed: Optional[int] = None) -> list[list[int]]:
+def distance_field(size: int, hub_center: tuple[int, int]) -> array:
+    """Hub distance of every tile, row-major, computed once per world."""
+    hx, hy = hub_center
+    dx2 = [(x - hx)**2 for x in range(size)]
+    field = array("d")
+    for y in range(size):
+        dy2 = (y - hy)**2
+        field.extend([(d + dy2) ** 0.5 for d in dx2])
+    return field
+
+def generate_world(seed: Optional[int] = None, size: Optional[int] = None) -> Grid:
     """
-    Generate a 200x200 world grid.
-    Returns 2D array where grid[y][x] = costume number.
+    Generate a world grid (world_size from settings unless `size` is given).
+    Returns a Grid where grid.get(x, y) = costume number.
+    
+    All randomness comes from a private random.Random(seed), so the same
+    seed always gives the same world no matter what else uses `random`.
     """
-    if seed is not None:
-        random.seed(seed)
+    rng = random.Random(seed)
     
-    tiles = load_tile_config()
-    settings = load_settings()
+    config = get_config()
+    tile_classes = config.tiles
+    tiles = tile_classes.config
+    settings = config.settings
     
-    size = settings["world_size"]
-    hub_center = tuple(settings["hub_center"])
+    if size is None or size == settings["world_size"]:
+        size = settings["world_size"]
+        hub_center = tuple(settings["hub_center"])
+    else:
+        hub_center = (size // 2, size // 2)
     hub_radius = settings["hub_radius"]
     
     floor_tile = tiles["primary_floor"]
     wall_tile = tiles["primary_wall"]
+    dist = distance_field(size, hub_center)
+    max_dist = size * 0.7
     
     # Initialize with walls
-    grid = [[wall_tile for _ in range(size)] for _ in range(size)]
-    
-    # Carve out the hub area (always open floor)
-    for y in range(hub_center[1] - hub_radius, hub_center[1] + hub_radius + 1):
-        for x in range(hub_center[0] - hub_radius, hub_center[0] + hub_radius + 1):
-            if 0 <= x < size and 0 <= y < size:
-                grid[y][x] = floor_tile
+    grid = Grid(size, wall_tile, tiles=tile_classes)
+    cells = grid.cells
     
-    # Use recursive backtracker maze generation
-    # Start from hub and carve outward
-    visited = [[False] * size for _ in range(size)]
-    
-    # Mark hub as visited
+    # Carve out the hub area (always open floor) and mark it visited
+    visited = bytearray(size * size)
     for y in range(hub_center[1] - hub_radius, hub_center[1] + hub_radius + 1):
         for x in range(hub_center[0] - hub_radius, hub_center[0] + hub_radius + 1):
             if 0 <= x < size and 0 <= y < size:
-                visited[y][x] = True
+                cells[y * size + x] = floor_tile
+                visited[y * size + x] = 1
     
     # Carve maze from multiple starting points around hub edge
     start_points = []
     for y in range(hub_center[1] - hub_radius - 1, hub_center[1] + hub_radius + 2):
         for x in range(hub_center[0] - hub_radius - 1, hub_center[0] + hub_radius + 2):
             if 0 <= x < size and 0 <= y < size:
-                if not visited[y][x]:
+                if not visited[y * size + x]:
                     # Check if adjacent to hub
                     for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
                         ny, nx = y + dy, x + dx
-                        if 0 <= nx < size and 0 <= ny < size and visited[ny][nx]:
-                            start_points.append((x, y))
+                        if 0 <= nx < size and 0 <= ny < size and visited[ny * size + nx]:
+                            start_points.append(y * size + x)
                             break
     
     # Shuffle and limit start points
-    random.shuffle(start_points)
+    rng.shuffle(start_points)
     start_points = start_points[:8]  # 8 main corridors from hub
     
-    def carve_maze(start_x: int, start_y: int):
-        """Recursive backtracker maze carving."""
-        stack = [(start_x, start_y)]
-        visited[start_y][start_x] = True
-        grid[start_y][start_x] = floor_tile
+    step = 2 * size
+    
+    def carve_maze(start: int):
+        """Recursive backtracker maze carving over flat indexes."""
+        stack = [start]
+        visited[start] = 1
+        cells[start] = floor_tile
         
         while stack:
-            x, y = stack[-1]
+            i = stack[-1]
+            x = i % size
             
-            # Get unvisited neighbors (2 steps away for maze walls)
+            # Unvisited cells 2 steps away (up, down, left, right), with the wall between
             neighbors = []
-            for dy, dx in [(-2, 0), (2, 0), (0, -2), (0, 2)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < size and 0 <= ny < size and not visited[ny][nx]:
-                    neighbors.append((nx, ny, dx // 2, dy // 2))
+            if i >= step and not visited[i - step]:
+                neighbors.append((i - step, i - size))
+            if i + step < size * size and not visited[i + step]:
+                neighbors.append((i + step, i + size))
+            if x >= 2 and not visited[i - 2]:
+                neighbors.append((i - 2, i - 1))
+            if x + 2 < size and not visited[i + 2]:
+                neighbors.append((i + 2, i + 1))
             
             if neighbors:
-                # Choose based on complexity (prefer continuing straight when simple)
-                dist = distance_from_hub(x, y, hub_center)
-                complexity = get_complexity(dist, size * 0.7)
-                
-                if random.random() < complexity:
-                    # High complexity: random choice
-                    nx, ny, wx, wy = random.choice(neighbors)
-                else:
-                    # Low complexity: prefer continuing in same direction or random
-                    nx, ny, wx, wy = random.choice(neighbors)
-                
-                # Carve wall between current and next
-                grid[y + wy][x + wx] = floor_tile
-                visited[y + wy][x + wx] = True
+                # Complexity roll: both outcomes currently pick a random
+                # neighbor, but the draw keeps seeds producing the same worlds
+                rng.random()
+                ni, wall_i = rng.choice(neighbors)
                 
-                # Carve next cell
-                grid[ny][nx] = floor_tile
-                visited[ny][nx] = True
+                # Carve wall between current and next, then the next cell
+                cells[wall_i] = floor_tile
+                visited[wall_i] = 1
+                cells[ni] = floor_tile
+                visited[ni] = 1
                 
-                stack.append((nx, ny))
+                stack.append(ni)
             else:
                 stack.pop()
     
     # Carve from each start point
-    for sx, sy in start_points:
-        if not visited[sy][sx]:
-            carve_maze(sx, sy)
+    for i in start_points:
+        if not visited[i]:
+            carve_maze(i)
     
     # Fill remaining unvisited areas with their own maze sections
     for y in range(1, size - 1, 2):
-        for x in range(1, size - 1, 2):
-            if not visited[y][x]:
-                carve_maze(x, y)
+        for i in range(y * size + 1, y * size + size - 1, 2):
+            if not visited[i]:
+                carve_maze(i)
     
-    # Add extra loops based on complexity (reduce dead ends near hub)
+    # Add extra loops (remove walls) more often near hub to reduce dead ends.
+    # Cells opened earlier in the scan count as floor for later ones.
     for y in range(1, size - 1):
-        for x in range(1, size - 1):
-            if grid[y][x] == wall_tile:
-                dist = distance_from_hub(x, y, hub_center)
-                complexity = get_complexity(dist, size * 0.7)
-                
-                # Count adjacent floors
-                floor_neighbors = 0
-                for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    if grid[y + dy][x + dx] == floor_tile:
-                        floor_neighbors += 1
-                
-                # Add loops (remove walls) more often near hub
-                if floor_neighbors >= 2:
-                    loop_chance = 0.15 * (1 - complexity)
-                    if random.random() < loop_chance:
-                        grid[y][x] = floor_tile
-    
-    # Sprinkle ores based on tier/distance
-    ore_tiles = tiles["ore"]
-    for y in range(size):
-        for x in range(size):
-            if grid[y][x] == floor_tile:
-                dist = distance_from_hub(x, y, hub_center)
-                
-                # Determine which tier ores can spawn here
-                ore_chance = 0.03  # 3% base chance for ore
-                if random.random() < ore_chance:
-                    # Pick an ore appropriate for this distance
-                    valid_ores = []
-                    for ore_id, ore_data in ore_tiles.items():
-                        ore_tier = ore_data["tier"]
-                        # Tier 1: 0-25, Tier 2: 26-50, etc.
-                        min_dist_for_tier = (ore_tier - 1) * 25
-                        max_dist_for_tier = ore_tier * 40
-                        if min_dist_for_tier <= dist <= max_dist_for_tier:
-                            valid_ores.append(int(ore_id))
-                    
-                    if valid_ores:
-                        grid[y][x] = random.choice(valid_ores)
+        row = y * size
+        for i in range(row + 1, row + size - 1):
+            if cells[i] != wall_tile:
+                continue
+            floor_neighbors = (
+                (cells[i - size] == floor_tile)
+                + (cells[i + size] == floor_tile)
+                + (cells[i - 1] == floor_tile)
+                + (cells[i + 1] == floor_tile)
+            )
+            if floor_neighbors >= 2:
+                loop_chance = 0.15 * (1 - min(1.0, dist[i] / max_dist))
+                if rng.random() < loop_chance:
+                    cells[i] = floor_tile
+    
+    # Sprinkle ores based on tier/distance (3% of floor tiles)
+    ore_ids_at_distance = config.ore_ids_at_distance
+    rand = rng.random
+    for i, tile in enumerate(cells):
+        if tile == floor_tile and rand() < 0.03:
+            valid_ores = ore_ids_at_distance(dist[i])
+            if valid_ores:
+                cells[i] = rng.choice(valid_ores)
     
     return grid
 
-def flatten_grid(grid: list[list[int]]) -> list:
+def flatten_grid(grid: Grid, layer1: Optional[list] = None) -> list:
     """
-    Flatten 2D grid to 1D for Scratch GRID list.
+    Flatten grid to 1D for Scratch GRID list.
     Index 0 = (x=0, y=0), increases x first, then y.
+    `layer1`, if given, fills the second layer (e.g. the scouted map).
     
     Returns list of 120,000 elements (3 layers).
     """
-    size = len(grid)
-    layer0 = []
-    
-    for y in range(size):
-        for x in range(size):
-            layer0.append(grid[y][x])
+    size = grid.size
+    layer0 = list(grid.cells)
     
-    # Pad with "" for layers 1 and 2
-    blank_layers = [""] * (size * size * 2)
+    # Pad with "" for unused layers
+    blank_layer = [""] * (size * size)
     
-    return layer0 + blank_layers
+    return layer0 + (layer1 if layer1 is not None else blank_layer) + blank_layer
 
 def get_sector(x: int, y: int, sector_size: int = 25) -> tuple[int, int]:
     """Get sector coordinates for a world position."""
@@ -205,22 +195,62 @@ def get_sector_bounds(sx: int, sy: int, sector_size: int = 25) -> tuple[int, int
     max_y = min_y + sector_size - 1
     return (min_x, min_y, max_x, max_y)
 
-def save_world(grid: list[list[int]], filepath: str = "state/world.json"):
-    """Save world state to file."""
-    with open(filepath, "w") as f:
-        json.dump({
-            "grid": grid,
-            "scouted": {},  # Will be populated as players scout
-            "sectors": {},   # Sector metadata (regen timers, etc.)
-            "structures": [],
-            "calamities": [],
-            "bounties": []
-        }, f)
+WORLD_SECTIONS = ("scouted", "sectors", "structures", "calamities", "bounties")
+
+def new_world_state(grid: Grid) -> dict:
+    """Wrap a freshly generated grid in an empty world state."""
+    return {
+        "grid": grid,
+        "scouted": ScoutedMap(grid.size),  # Will be populated as players scout
+        "sectors": {},   # Sector metadata (regen timers, etc.)
+        "structures": [],
+        "calamities": [],
+        "bounties": []
+    }
+
+def save_world(world_state: dict, filepath: str = "state/world.bin", sections_dirty: bool = True):
+    """
+    Save world state to the binary world file.
+    If only tiles changed since the last save and the file already holds
+    this grid, those tiles are patched in place; otherwise the whole file
+    is rewritten atomically.
+    """
+    grid = world_state["grid"]
+    
+    if not sections_dirty and not grid.all_dirty and read_world_size(filepath) == grid.size:
+        if grid.dirty:
+            write_tiles(filepath, grid, grid.dirty)
+    else:
+        sections = {k: v for k, v in world_state.items() if k != "grid"}
+        sections["scouted"] = world_state["scouted"].to_bytes()
+        write_world_file(filepath, grid, sections)
+    
+    grid.mark_clean()
+
+def load_world(filepath: str = "state/world.bin", legacy_filepath: str = "state/world.json") -> Optional[dict]:
+    """
+    Load world state from file. The "grid" entry is returned as a Grid.
+    Falls back to the legacy JSON world file if no binary file exists yet.
+    """
+    try:
+        grid, sections = read_world_file(filepath)
+    except FileNotFoundError:
+        return load_legacy_world(legacy_filepath)
+    
+    world_state = new_world_state(grid)
+    world_state.update(sections)
+    world_state["scouted"] = load_scouted(sections.get("scouted"), grid.size)
+    return world_state
 
-def load_world(filepath: str = "state/world.json") -> dict:
-    """Load world state from file."""
+def load_legacy_world(filepath: str = "state/world.json") -> Optional[dict]:
+    """Load a world saved in the old JSON format (grid as nested lists)."""
     try:
         with open(filepath, "r") as f:
-            return json.load(f)
+            world_data = json.load(f)
     except FileNotFoundError:
         return None
+    
+    world_state = new_world_state(Grid.from_rows(world_data.pop("grid")))
+    world_state.update(world_data)
+    world_state["scouted"] = load_scouted(world_data.get("scouted"), world_state["grid"].size)
+    return world_state